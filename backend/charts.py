@@ -0,0 +1,225 @@
+"""Chart rendering on explicit Figure objects.
+
+Nothing here goes through pyplot or changes matplotlib's global rcParams
+(apart from svg.hashsalt while an SVG is saved, see `image_bytes`): every
+chart gets its own `Figure` and Agg canvas, so request threads can render
+concurrently.
+
+Line charts are described by a plain dict (picklable, so it can be handed
+to another process):
+
+    {"title": str, "ylabel": str, "xlabel": str or None,
+     "ops": [(method, args, kwargs)], "ylim": (low, high) or None,
+     "legend": bool}
+
+where each op is an Axes call such as ("plot", (x, y), {"label": "AAPL"}),
+("fill_between", (x, upper, lower), {...}) or ("axhline", (), {"y": 0}),
+applied in order. Charts with the same layout reuse one figure, see
+`line_chart`.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib
+from matplotlib import collections as mcollections
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import mplfinance as mpf
+import pandas as pd
+
+# Candlestick layout mplfinance uses for figratio=(14, 8): main panel over a
+# volume panel, heights 5:2, inside the default paddings
+CANDLE_FIGSIZE = (14 * 5.75 / 8, 5.75)
+CANDLE_PANELS = [(0.18, 0.38, 0.72, 0.5), (0.18, 0.18, 0.72, 0.2)]
+CANDLE_STYLE = 'charles'
+
+# Output formats by `format` name; any of them can be passed as fmt below
+MIMETYPES = {'png': 'image/png', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'svg': 'image/svg+xml'}
+# Salt for the ids matplotlib hashes into SVG output (random per save by default)
+SVG_HASHSALT = 'charts'
+_svg_lock = threading.Lock()
+
+# Line charts reuse finished figures: a template of the same layout gets the
+# new data via set_data instead of building a figure, axes, grid and legend
+# again. Each process keeps up to max_templates of them, least recently used
+# dropped first; a template is taken out while a render uses it.
+TEMPLATE_METHODS = {'plot', 'axhline'}
+# Fills can only be updated in place from matplotlib 3.10 (FillBetweenPolyCollection.set_data)
+if hasattr(mcollections, 'FillBetweenPolyCollection'):
+    TEMPLATE_METHODS.add('fill_between')
+max_templates = 16
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+# Subplot margins of a new Figure (rcParams defaults), filled in by the first one built
+SUBPLOT_DEFAULTS = {}
+
+
+def new_figure(figsize):
+    """A Figure with its own Agg canvas, independent of pyplot"""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def image_bytes(fig, dpi, fmt='png', exact_size=False):
+    """Encoded image of fig. Cropped to what was drawn unless exact_size, which
+    keeps the canvas at figsize * dpi pixels.
+
+    The same chart always gives the same bytes, as the strong ETags need:
+    SVGs get no date and a fixed salt for their clip-path ids. The salt is
+    an rcParam, so SVG saves set it one at a time.
+    """
+    buf = io.BytesIO()
+    options = dict(format=fmt, dpi=dpi, bbox_inches=None if exact_size else 'tight', facecolor='white')
+    if fmt == 'svg':
+        with _svg_lock, matplotlib.rc_context({'svg.hashsalt': SVG_HASHSALT}):
+            fig.savefig(buf, metadata={'Date': None}, **options)
+    else:
+        fig.savefig(buf, **options)
+    return buf.getvalue()
+
+
+def _layout(spec, figsize):
+    """What a line chart shares with every chart a figure can be reused for.
+
+    Everything except the data and the text: figure size, each call's
+    method and style, which entries have legend labels, y limits and
+    whether there is an x label. None if some call cannot be updated in place.
+    """
+    ops = []
+    for method, args, kwargs in spec['ops']:
+        if method not in TEMPLATE_METHODS:
+            return None
+        style = tuple(sorted((k, v) for k, v in kwargs.items() if k != 'label'))
+        ops.append((method, len(args), style, 'label' in kwargs))
+    return (tuple(figsize), tuple(ops), spec.get('ylim'), bool(spec.get('xlabel')), bool(spec.get('legend')))
+
+
+def _plain_dates(values):
+    """Naive UTC datetime64 for a tz-aware DatetimeIndex, which matplotlib
+    would otherwise convert one Timestamp at a time"""
+    if isinstance(values, pd.DatetimeIndex) and values.tz is not None:
+        return values.tz_convert('UTC').tz_localize(None).to_numpy()
+    return values
+
+
+def _build_line_chart(spec, figsize):
+    fig = new_figure(figsize)
+    SUBPLOT_DEFAULTS.setdefault('left', fig.subplotpars.left)
+    SUBPLOT_DEFAULTS.setdefault('right', fig.subplotpars.right)
+    SUBPLOT_DEFAULTS.setdefault('bottom', fig.subplotpars.bottom)
+    SUBPLOT_DEFAULTS.setdefault('top', fig.subplotpars.top)
+    ax = fig.add_subplot()
+    artists = []
+    for method, args, kwargs in spec['ops']:
+        artist = getattr(ax, method)(*map(_plain_dates, args), **kwargs)
+        artists.append(artist[0] if isinstance(artist, list) else artist)
+    if spec.get('ylim') is not None:
+        ax.set_ylim(*spec['ylim'])
+    ax.grid(True, alpha=0.3)
+    return fig, ax, artists
+
+
+def _update_line_chart(ax, artists, spec):
+    """Swap new data into a template built for the same layout"""
+    # tight_layout depends on where it starts (the legend sits outside the
+    # axes), so start from a new figure's subplot positions every time
+    ax.figure.subplots_adjust(**SUBPLOT_DEFAULTS)
+    for artist, (method, args, kwargs) in zip(artists, spec['ops']):
+        args = tuple(map(_plain_dates, args))
+        if method == 'plot':
+            artist.set_data(*args)
+        elif method == 'fill_between':
+            artist.set_data(*args, *(0,) * (3 - len(args)))
+        if 'label' in kwargs:
+            artist.set_label(kwargs['label'])
+    ax.relim()
+    # relim() only counts collections (the fills) from matplotlib 3.11 on
+    for artist in artists:
+        if isinstance(artist, mcollections.Collection):
+            ax.update_datalim(artist.get_datalim(ax.transData).get_points())
+    ax.autoscale_view()
+
+
+def _label_line_chart(ax, spec):
+    ax.set_title(spec['title'], fontsize=16, fontweight='bold')
+    ax.set_ylabel(spec['ylabel'], fontsize=12)
+    if spec.get('xlabel'):
+        ax.set_xlabel(spec['xlabel'], fontsize=12)
+    if spec.get('legend'):
+        ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+
+
+def line_chart(spec, figsize, dpi, fmt='png', exact_size=False):
+    """Image bytes for a line chart spec, on a reused figure when one fits"""
+    layout = _layout(spec, figsize)
+    template = None
+    if layout is not None:
+        with _templates_lock:
+            template = _templates.pop(layout, None)
+
+    if template is None:
+        fig, ax, artists = _build_line_chart(spec, figsize)
+    else:
+        fig, ax, artists = template
+        _update_line_chart(ax, artists, spec)
+    _label_line_chart(ax, spec)
+    fig.tight_layout()
+    body = image_bytes(fig, dpi, fmt, exact_size)
+
+    if layout is not None and max_templates > 0:
+        with _templates_lock:
+            _templates[layout] = (fig, ax, artists)
+            while len(_templates) > max_templates:
+                _templates.popitem(last=False)
+    return body
+
+
+def _style_candle_axes(ax):
+    # What the 'charles' style sets through rcParams in mplfinance's own figures
+    ax.set_facecolor('w')
+    for spine in ax.spines.values():
+        spine.set_edgecolor('white')
+        spine.set_linewidth(1.5)
+    ax.set_axisbelow(True)
+    ax.grid(True, axis='both', color='#a0a0a0', linestyle='--', linewidth=0.4)
+    ax.yaxis.tick_right()
+    ax.yaxis.set_label_position('right')
+    ax.yaxis.label.set_size('large')
+    ax.yaxis.label.set_weight('semibold')
+
+
+def candlestick_chart(ohlc, title, dpi, figsize=CANDLE_FIGSIZE, fmt='png', exact_size=False):
+    """Image bytes for a candlestick chart with a volume panel below it"""
+    fig = new_figure(figsize)
+    main = fig.add_axes(CANDLE_PANELS[0])
+    volume = fig.add_axes(CANDLE_PANELS[1], sharex=main)
+    # External axes mode: mplfinance draws into our axes and leaves rcParams alone
+    mpf.plot(ohlc, ax=main, volume=volume, type='candle', style=CANDLE_STYLE, ylabel='Price ($)')
+    main.tick_params(axis='x', labelbottom=False)
+    for ax in (main, volume):
+        _style_candle_axes(ax)
+    # The exponent is already part of the volume label
+    volume.yaxis.offsetText.set_visible(False)
+    fig.suptitle(title, fontsize='x-large', fontweight='semibold')
+    return image_bytes(fig, dpi, fmt, exact_size)
+
+
+def warm_up():
+    """Render throwaway charts so fonts, the font cache and mplfinance styles are loaded.
+
+    Real chart sizes at a low dpi: the layout has to fit, or tight_layout warns.
+    """
+    line_chart({
+        'title': 'warm-up',
+        'ylabel': 'warm-up',
+        'xlabel': 'Date',
+        'ops': [('plot', ([0, 1], [0, 1]), dict(label='warm-up'))],
+        'legend': True
+    }, (14, 8), 20)
+    ohlc = pd.DataFrame(
+        {'Open': [1.0, 2.0], 'High': [2.0, 3.0], 'Low': [0.5, 1.5], 'Close': [2.0, 1.5], 'Volume': [10, 20]},
+        index=pd.date_range('2020-01-01', periods=2)
+    )
+    candlestick_chart(ohlc, 'warm-up', 20)
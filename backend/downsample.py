@@ -0,0 +1,84 @@
+"""Reduce long series to about as many points as there are pixels to draw them.
+
+Largest-Triangle-Three-Buckets (Steinarsson, 2013) keeps the first and last
+points and, from each bucket in between, the point forming the largest
+triangle with the previously kept point and the average of the next
+bucket. Peaks and troughs survive, unlike plain striding or averaging.
+"""
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, threshold):
+    """Positions of the points LTTB keeps, in order (all of them if len(y) <= threshold)"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Relative x keeps the bucket sums small enough to stay exact
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x[0]
+    y = np.asarray(y, dtype=np.float64)
+
+    # threshold - 2 buckets over the points between the fixed first and last
+    edges = (1 + np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64)
+    edges[-1] = n - 1
+    starts, stops = edges[:-1], edges[1:]
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = stops - starts
+    mean_x = (sum_x[stops] - sum_x[starts]) / sizes
+    mean_y = (sum_y[stops] - sum_y[starts]) / sizes
+    # The point each bucket is weighed against: the next bucket's average, or the last point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        s, e = starts[i], stops[i]
+        ax, ay = x[anchor], y[anchor]
+        area = np.abs((ax - next_x[i]) * (y[s:e] - ay) - (ax - x[s:e]) * (next_y[i] - ay))
+        anchor = s + int(np.argmax(area))
+        keep[i + 1] = anchor
+    return keep
+
+
+def downsample_indices(x, y, threshold):
+    """lttb_indices over the finite values of y only; NaN/inf positions are dropped"""
+    y = np.asarray(y, dtype=np.float64)
+    if threshold is None or len(y) <= threshold:
+        return np.arange(len(y))
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) == len(y):
+        return lttb_indices(x, y, threshold)
+    return finite[lttb_indices(np.asarray(x)[finite], y[finite], threshold)]
+
+
+def series_x(series):
+    """Numeric x positions for a date-indexed Series"""
+    return pd.DatetimeIndex(series.index).asi8
+
+
+def thin(series, threshold, *others):
+    """Downsample a date-indexed Series to about `threshold` points.
+
+    Series in `others` share its index and are cut at the same positions
+    (e.g. the lower band along with the upper one). Returns the series
+    unchanged (or a tuple with `others`) when it is already short enough.
+    """
+    if threshold is not None and len(series) > threshold:
+        keep = downsample_indices(series_x(series), series.to_numpy(dtype=np.float64), threshold)
+        series = series.iloc[keep]
+        others = tuple(other.iloc[keep] for other in others)
+    return (series,) + others if others else series
+
+
+def thin_columns(columns, primary, threshold):
+    """Downsample a dict of aligned column arrays by the shape of columns[primary]"""
+    if threshold is None or len(columns[primary]) <= threshold:
+        return columns
+    keep = downsample_indices(columns["dates"], columns[primary], threshold)
+    return {name: values[keep] for name, values in columns.items()}
@@ -0,0 +1,527 @@
+import math
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+# EMAs never fully forget old prices; starting this many spans before the
+# requested window makes the difference from a full-history MACD negligible
+MACD_WARMUP_SPANS = 10
+
+
+# Technical analysis functions
+def calculate_rsi(series, window=14):
+    """Calculate Relative Strength Index"""
+    delta = series.diff(1)
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.rolling(window=window).mean()
+    avg_loss = loss.rolling(window=window).mean()
+    rs = avg_gain / avg_loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi
+
+def calculate_bollinger_bands(series, window=20, num_std=2):
+    """Calculate Bollinger Bands"""
+    sma = series.rolling(window=window).mean()
+    std = series.rolling(window=window).std()
+    upper_band = sma + (num_std * std)
+    lower_band = sma - (num_std * std)
+    return sma, upper_band, lower_band
+
+def calculate_macd(series, short_window=12, long_window=26, signal_window=9):
+    """Calculate MACD"""
+    short_ema = series.ewm(span=short_window, adjust=False).mean()
+    long_ema = series.ewm(span=long_window, adjust=False).mean()
+    macd = short_ema - long_ema
+    signal = macd.ewm(span=signal_window, adjust=False).mean()
+    return macd, signal
+
+def calculate_sma(series, window=20):
+    """Calculate Simple Moving Average"""
+    return series.rolling(window=window).mean()
+
+def calculate_returns(series):
+    """Calculate simple daily returns"""
+    return series / series.shift(1) - 1
+
+
+INDICATORS = {
+    'rsi': calculate_rsi,
+    'bollinger_bands': calculate_bollinger_bands,
+    'macd': calculate_macd,
+    'sma': calculate_sma,
+    'returns': calculate_returns,
+}
+
+
+class Intermediates:
+    """Building blocks shared between indicators on one series, each computed once.
+
+    Works on a Series or on a DataFrame of series; every block uses the
+    same pandas operations as the calculate_* functions, so indicators
+    assembled from them give identical results.
+    """
+
+    def __init__(self, prices):
+        self.prices = prices
+        self._blocks = {}
+
+    def _block(self, key, compute):
+        block = self._blocks.get(key)
+        if block is None:
+            block = self._blocks[key] = compute()
+        return block
+
+    def delta(self):
+        return self._block('delta', lambda: self.prices.diff(1))
+
+    def previous(self):
+        return self._block('previous', lambda: self.prices.shift(1))
+
+    def gain_mean(self, window):
+        delta = self.delta()
+        return self._block(('gain_mean', window), lambda: delta.where(delta > 0, 0).rolling(window=window).mean())
+
+    def loss_mean(self, window):
+        delta = self.delta()
+        return self._block(('loss_mean', window), lambda: (-delta.where(delta < 0, 0)).rolling(window=window).mean())
+
+    def rolling_mean(self, window):
+        return self._block(('mean', window), lambda: self.prices.rolling(window=window).mean())
+
+    def rolling_std(self, window):
+        return self._block(('std', window), lambda: self.prices.rolling(window=window).std())
+
+    def ema(self, span):
+        return self._block(('ema', span), lambda: self.prices.ewm(span=span, adjust=False).mean())
+
+
+def _fused_rsi(shared, window=14):
+    rs = shared.gain_mean(window) / shared.loss_mean(window)
+    return 100 - (100 / (1 + rs))
+
+def _fused_bollinger_bands(shared, window=20, num_std=2):
+    sma = shared.rolling_mean(window)
+    std = shared.rolling_std(window)
+    return sma, sma + (num_std * std), sma - (num_std * std)
+
+def _fused_macd(shared, short_window=12, long_window=26, signal_window=9):
+    macd = shared._block(('macd', short_window, long_window), lambda: shared.ema(short_window) - shared.ema(long_window))
+    signal = shared._block(('macd_signal', short_window, long_window, signal_window),
+                           lambda: macd.ewm(span=signal_window, adjust=False).mean())
+    return macd, signal
+
+def _fused_sma(shared, window=20):
+    return shared.rolling_mean(window)
+
+def _fused_returns(shared):
+    return shared._block('returns', lambda: shared.prices / shared.previous() - 1)
+
+
+FUSED = {
+    'rsi': _fused_rsi,
+    'bollinger_bands': _fused_bollinger_bands,
+    'macd': _fused_macd,
+    'sma': _fused_sma,
+    'returns': _fused_returns,
+}
+
+# The standard dashboard views: RSI(14), SMA(20), Bollinger(20, 2σ), MACD(12, 26, 9)
+DEFAULT_INDICATORS = ['rsi', 'sma', 'bollinger_bands', 'macd']
+
+
+def compute_many(prices, requested):
+    """Evaluate several indicators on one series, sharing their intermediates.
+
+    `requested` is a list of indicator names or (name, params) pairs, e.g.
+    ['rsi', ('sma', {'window': 50}), 'bollinger_bands']. Deltas, rolling
+    means and stds and EMAs needed by more than one of them are computed
+    once, so an SMA(20) next to Bollinger(20) or two MACDs sharing an EMA
+    cost one pass each. Returns the results in the order requested, each
+    as the matching calculate_* function would return it.
+    """
+    shared = Intermediates(prices)
+    results = []
+    for item in requested:
+        name, params = (item, {}) if isinstance(item, str) else item
+        results.append(FUSED[name](shared, **params))
+    return results
+
+
+# Streaming versions: carry state between bars so appending one bar costs O(1).
+# They follow pandas' own running accumulators (compensated sums for rolling
+# means, Welford updates for rolling variance, the adjust=False EMA recurrence)
+# so feeding a series bar by bar reproduces the functions above, down to
+# rounding in the last bits for very short std windows.
+class RollingMean:
+    """series.rolling(window).mean(), one value at a time"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.total = 0.0
+        self.negatives = 0
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.repeats = 0
+        self.last = math.nan
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.remove_compensation
+                t = self.total + y
+                self.remove_compensation = t - self.total - y
+                self.total = t
+                if math.copysign(1.0, old) < 0:
+                    self.negatives -= 1
+        self.values.append(value)
+        if value == value:
+            self.nobs += 1
+            y = value - self.add_compensation
+            t = self.total + y
+            self.add_compensation = t - self.total - y
+            self.total = t
+            if math.copysign(1.0, value) < 0:
+                self.negatives += 1
+            self.repeats = self.repeats + 1 if value == self.last else 1
+            self.last = value
+
+        if self.nobs < self.window or self.nobs == 0:
+            return math.nan
+        if self.repeats >= self.nobs:
+            return self.last
+        mean = self.total / self.nobs
+        if self.negatives == 0 and mean < 0:
+            return 0.0
+        if self.negatives == self.nobs and mean > 0:
+            return 0.0
+        return mean
+
+
+class RollingStd:
+    """series.rolling(window).std() (ddof=1), one value at a time, via Welford updates"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.mean = 0.0
+        self.sum_sq_dev = 0.0
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.repeats = 0
+        self.last = math.nan
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                if self.nobs:
+                    prev_mean = self.mean - self.remove_compensation
+                    y = old - self.remove_compensation
+                    t = y - self.mean
+                    self.remove_compensation = t + self.mean - y
+                    self.mean -= t / self.nobs
+                    self.sum_sq_dev -= (old - prev_mean) * (old - self.mean)
+                else:
+                    self.mean = 0.0
+                    self.sum_sq_dev = 0.0
+        self.values.append(value)
+        if value == value:
+            self.repeats = self.repeats + 1 if value == self.last else 1
+            self.last = value
+            self.nobs += 1
+            prev_mean = self.mean - self.add_compensation
+            y = value - self.add_compensation
+            t = y - self.mean
+            self.add_compensation = t + self.mean - y
+            self.mean += t / self.nobs
+            self.sum_sq_dev += (value - prev_mean) * (value - self.mean)
+            if self.repeats >= self.nobs:
+                # A run of identical values: drop accumulated rounding error
+                self.mean = value
+                self.sum_sq_dev = 0.0
+
+        if self.nobs < self.window or self.nobs < 2:
+            return math.nan
+        if self.repeats >= self.nobs:
+            return 0.0
+        return math.sqrt(max(self.sum_sq_dev / (self.nobs - 1), 0.0))
+
+
+class EMA:
+    """series.ewm(span=span, adjust=False).mean(), one value at a time"""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = math.nan
+
+    def update(self, value):
+        if self.value != self.value:
+            self.value = value
+        elif value == value and value != self.value:
+            old_weight = 1.0 - self.alpha
+            self.value = (old_weight * self.value + self.alpha * value) / (old_weight + self.alpha)
+        return self.value
+
+
+def _ratio(numerator, denominator):
+    """numerator / denominator with pandas' inf/NaN results for a zero denominator"""
+    if denominator == 0:
+        if numerator != numerator or numerator == 0:
+            return math.nan
+        return math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+    return numerator / denominator
+
+
+class RSIState:
+    """Incremental calculate_rsi: update(price) returns the RSI for that bar"""
+
+    def __init__(self, window=14):
+        self.previous = math.nan
+        self.avg_gain = RollingMean(window)
+        self.avg_loss = RollingMean(window)
+
+    def update(self, price):
+        delta = price - self.previous
+        self.previous = price
+        gain = delta if delta > 0 else 0.0
+        loss = -(delta if delta < 0 else 0.0)
+        rs = _ratio(self.avg_gain.update(gain), self.avg_loss.update(loss))
+        return 100 - (100 / (1 + rs))
+
+
+class BollingerState:
+    """Incremental calculate_bollinger_bands: update(price) returns (sma, upper, lower)"""
+
+    def __init__(self, window=20, num_std=2):
+        self.num_std = num_std
+        self.sma = RollingMean(window)
+        self.std = RollingStd(window)
+
+    def update(self, price):
+        sma = self.sma.update(price)
+        std = self.std.update(price)
+        return sma, sma + (self.num_std * std), sma - (self.num_std * std)
+
+
+class MACDState:
+    """Incremental calculate_macd: update(price) returns (macd, signal)"""
+
+    def __init__(self, short_window=12, long_window=26, signal_window=9):
+        self.short_ema = EMA(short_window)
+        self.long_ema = EMA(long_window)
+        self.signal_ema = EMA(signal_window)
+
+    def update(self, price):
+        macd = self.short_ema.update(price) - self.long_ema.update(price)
+        return macd, self.signal_ema.update(macd)
+
+
+STREAMING = {
+    'rsi': RSIState,
+    'bollinger_bands': BollingerState,
+    'macd': MACDState,
+}
+
+
+def _left_justify(prices):
+    """Shift every column up so its first observation sits in row 0.
+
+    Returns the shifted matrix and each column's original first row. With
+    all series starting together, one column-wise pass gives exactly what
+    the per-Series functions give on each symbol's own dropna()'d history.
+    """
+    n_rows, n_cols = prices.shape
+    valid = ~np.isnan(prices)
+    first = np.where(valid.any(axis=0), valid.argmax(axis=0), n_rows)
+    rows = first[None, :] + np.arange(n_rows)[:, None]
+    inside = rows < n_rows
+    shifted = np.where(inside, prices[np.minimum(rows, n_rows - 1), np.arange(n_cols)], np.nan)
+    return shifted, first
+
+
+def _restore(shifted, first, valid):
+    """Undo _left_justify on an output matrix and blank the rows with no input"""
+    n_rows, n_cols = shifted.shape
+    source = np.arange(n_rows)[:, None] - first[None, :]
+    restored = np.where(source >= 0, shifted[np.clip(source, 0, n_rows - 1), np.arange(n_cols)], np.nan)
+    restored[~valid] = np.nan
+    return restored
+
+
+def batch_indicators(prices, requested):
+    """Compute several indicators for many symbols in one vectorized pass each.
+
+    `prices` is a 2-D float array (dates x symbols) and `requested` maps
+    indicator names from INDICATORS to their keyword params, e.g.
+    {'rsi': {}, 'macd': {'signal_window': 9}}. The indicators are evaluated
+    together (see compute_many) over the whole matrix using the same pandas
+    kernels as the single-series functions, so for columns without gaps inside their history the output
+    equals calling them symbol by symbol. Returns {name: array} (a tuple of
+    arrays for multi-output indicators), aligned with `prices` and NaN
+    wherever the input is NaN.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim != 2:
+        raise ValueError("prices must be a 2-D dates x symbols array")
+    valid = ~np.isnan(prices)
+    shifted, first = _left_justify(prices)
+    frame = pd.DataFrame(shifted, copy=False)
+
+    results = {}
+    for name, output in zip(requested, compute_many(frame, list(requested.items()))):
+        if isinstance(output, tuple):
+            results[name] = tuple(_restore(part.to_numpy(), first, valid) for part in output)
+        else:
+            results[name] = _restore(output.to_numpy(), first, valid)
+    return results
+
+
+# Names of the parts of multi-output indicators, in the order they are returned
+OUTPUTS = {
+    'bollinger_bands': ('middle', 'upper', 'lower'),
+    'macd': ('macd', 'signal'),
+}
+
+
+# Tunable parameters per indicator as (default, minimum, maximum). The bounds
+# keep the work per request and the number of distinct cached series in check.
+PARAMETERS = {
+    'rsi': {'window': (14, 2, 100)},
+    'sma': {'window': (20, 2, 250)},
+    'bollinger_bands': {'window': (20, 2, 250), 'num_std': (2, 0.5, 4)},
+    'macd': {'short_window': (12, 2, 100), 'long_window': (26, 3, 200), 'signal_window': (9, 2, 100)},
+    'returns': {},
+}
+
+
+def normalize_params(name, raw):
+    """Validate raw (string) parameters for an indicator.
+
+    Returns only the ones that differ from the defaults, so equivalent
+    requests share cache keys and default requests match the precomputed
+    series. Raises ValueError for unknown, malformed or out-of-range values.
+    """
+    spec = PARAMETERS[name]
+    params = {}
+    for param, value in raw.items():
+        if param not in spec:
+            raise ValueError(f"'{param}' is not a parameter of {name}")
+        default, low, high = spec[param]
+        try:
+            number = int(value) if isinstance(low, int) else float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{param}' must be a number, got {value!r}")
+        if not low <= number <= high:
+            raise ValueError(f"'{param}' must be between {low:g} and {high:g}")
+        if number != default:
+            params[param] = number
+    if name == 'macd':
+        short = params.get('short_window', spec['short_window'][0])
+        long = params.get('long_window', spec['long_window'][0])
+        if short >= long:
+            raise ValueError("'short_window' must be less than 'long_window'")
+    return params
+
+
+def resolved_params(name, params):
+    """Every parameter of an indicator, with defaults filled in"""
+    return {param: params.get(param, spec[0]) for param, spec in PARAMETERS[name].items()}
+
+
+def lookback(name, **params):
+    """Rows of history before a window that the indicator needs to be warmed up"""
+    if name == 'rsi':
+        return params.get('window', 14)
+    if name == 'bollinger_bands':
+        return params.get('window', 20) - 1
+    if name == 'macd':
+        return MACD_WARMUP_SPANS * (params.get('long_window', 26) + params.get('signal_window', 9))
+    if name == 'sma':
+        return params.get('window', 20) - 1
+    if name == 'returns':
+        return 1
+    raise KeyError(name)
+
+
+def result_nbytes(result):
+    if isinstance(result, tuple):
+        return sum(result_nbytes(part) for part in result)
+    return int(result.memory_usage(index=True, deep=False))
+
+
+class IndicatorCache:
+    """Size-bounded LRU of computed indicator series.
+
+    Keys start with the symbol and include its data version, so results for
+    old data can never be returned; invalidate() additionally frees them as
+    soon as the data layer reloads a symbol.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Cached result for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def get_or_compute(self, key, compute):
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def put(self, key, result):
+        size = result_nbytes(result)
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (result, size)
+            self.current_bytes += size
+            while self.max_bytes and self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def invalidate(self, symbol):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == symbol]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "mb": round(self.current_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,1214 @@
+import io
+import itertools
+import json
+import os
+import struct
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+# Columns kept for every symbol, in CSV order (after the Date column)
+PRICE_COLUMNS = ['Adj_Close', 'Close', 'High', 'Low', 'Open', 'Volume']
+
+# yfinance export layout: three header lines, then "2020-01-02 00:00:00+00:00,..." rows
+YFINANCE_HEADER = (b"Price,", b"Ticker,", b"Date,")
+TIMESTAMP_WIDTH = 25
+
+SNAPSHOT_DIRNAME = ".cache"
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_FORMAT = 1
+
+# Single read-only file shared by every worker through mmap
+STORE_NAME = "prices.store"
+STORE_MAGIC = b"PXSTORE1"
+STORE_ALIGN = 64
+
+# How much of the start of a CSV incremental refreshes check for rewrites
+PREFIX_CHECK_BYTES = 4096
+
+
+def snapshot_dir(directory):
+    """Folder holding the binary snapshots for a data directory"""
+    return os.path.join(directory, SNAPSHOT_DIRNAME)
+
+
+def source_signature(filepath):
+    """mtime/size pair used to decide whether a snapshot is still valid"""
+    st = os.stat(filepath)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def load_manifest(directory):
+    path = os.path.join(snapshot_dir(directory), MANIFEST_NAME)
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"format": SNAPSHOT_FORMAT, "symbols": {}}
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return {"format": SNAPSHOT_FORMAT, "symbols": {}}
+    return manifest
+
+
+def save_manifest(directory, manifest):
+    """Write the manifest atomically so concurrent workers never see half a file"""
+    folder = snapshot_dir(directory)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def frame_to_dates(stock_data):
+    index = pd.DatetimeIndex(stock_data.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC')
+    return index.as_unit('ns').asi8
+
+
+def frame_to_arrays(stock_data):
+    """Split a cleaned price frame into int64 epoch-ns dates plus one array per column"""
+    arrays = {"Date": frame_to_dates(stock_data)}
+    for col in PRICE_COLUMNS:
+        arrays[col] = stock_data[col].to_numpy()
+    return arrays
+
+
+def arrays_to_frame(arrays):
+    """Rebuild the DataFrame layout load_stock_data produces from snapshot arrays"""
+    index = pd.DatetimeIndex(
+        np.asarray(arrays["Date"], dtype=np.int64).view('datetime64[ns]'),
+        name='Date'
+    ).tz_localize('UTC')
+    return pd.DataFrame(
+        {col: arrays[col] for col in PRICE_COLUMNS},
+        index=index
+    )
+
+
+def read_snapshot(directory, symbol, filepath, manifest):
+    """Return the cached frame for symbol, or None if missing or out of date"""
+    entry = manifest["symbols"].get(symbol)
+    if entry is None:
+        return None
+
+    try:
+        signature = source_signature(filepath)
+    except OSError:
+        return None
+    if entry.get("mtime_ns") != signature["mtime_ns"] or entry.get("size") != signature["size"]:
+        return None
+
+    path = os.path.join(snapshot_dir(directory), entry["file"])
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in ["Date"] + PRICE_COLUMNS}
+    except (OSError, KeyError, ValueError):
+        return None
+
+    if len(arrays["Date"]) != entry.get("rows"):
+        return None
+    return arrays_to_frame(arrays)
+
+
+def write_snapshot(directory, symbol, filepath, stock_data, manifest):
+    """Store a cleaned frame as an uncompressed .npz and record it in the manifest"""
+    folder = snapshot_dir(directory)
+    os.makedirs(folder, exist_ok=True)
+
+    filename = f"{symbol}.npz"
+    path = os.path.join(folder, filename)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **frame_to_arrays(stock_data))
+    os.replace(tmp_path, path)
+
+    entry = source_signature(filepath)
+    entry.update({
+        "file": filename,
+        "rows": len(stock_data),
+        "start": stock_data.index.min().strftime('%Y-%m-%d'),
+        "end": stock_data.index.max().strftime('%Y-%m-%d'),
+    })
+    manifest["symbols"][symbol] = entry
+    return entry
+
+
+def read_indicator_snapshot(directory, symbol, filepath, manifest, spec, rows):
+    """Stored indicator arrays for symbol as {name: [arrays]}, or None if missing or stale.
+
+    They are only used while the price snapshot entry they belong to still
+    matches the CSV, was computed for the same `spec`, and covers `rows`.
+    """
+    entry = manifest["symbols"].get(symbol)
+    stored = (entry or {}).get("indicators")
+    if stored is None or stored.get("spec") != spec or stored.get("rows") != rows:
+        return None
+    try:
+        signature = source_signature(filepath)
+    except OSError:
+        return None
+    if entry.get("mtime_ns") != signature["mtime_ns"] or entry.get("size") != signature["size"]:
+        return None
+
+    path = os.path.join(snapshot_dir(directory), stored["file"])
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            results = {}
+            for name, parts in stored["outputs"].items():
+                results[name] = [npz[f"{name}_{k}"] for k in range(parts)]
+    except (OSError, KeyError, ValueError):
+        return None
+    if any(len(part) != rows for parts in results.values() for part in parts):
+        return None
+    return results
+
+
+def write_indicator_snapshot(directory, symbol, results, manifest, spec):
+    """Store {name: Series or tuple of Series} next to the symbol's price snapshot"""
+    entry = manifest["symbols"].get(symbol)
+    if entry is None:
+        return None
+    folder = snapshot_dir(directory)
+    filename = f"{symbol}.indicators.npz"
+    path = os.path.join(folder, filename)
+
+    arrays = {}
+    outputs = {}
+    rows = None
+    for name, result in results.items():
+        parts = result if isinstance(result, tuple) else (result,)
+        outputs[name] = len(parts)
+        for k, part in enumerate(parts):
+            arrays[f"{name}_{k}"] = part.to_numpy(dtype=np.float64)
+            rows = len(part)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    entry["indicators"] = {"file": filename, "spec": spec, "rows": rows, "outputs": outputs}
+    return entry
+
+
+def row_starts(raw):
+    """Offsets of the non-blank lines in a uint8 view of CSV rows"""
+    starts = np.concatenate(([0], np.flatnonzero(raw == ord('\n')) + 1))
+    starts = starts[starts < raw.size]
+    return starts[(raw[starts] != ord('\n')) & (raw[starts] != ord('\r'))]
+
+
+def parse_timestamps(body):
+    """Turn the fixed-width "YYYY-MM-DD HH:MM:SS+HH:MM" row prefixes into int64 epoch-ns.
+
+    Works on the raw bytes of the data block, so no per-row string objects
+    are created. Returns None if any row does not match the layout.
+    """
+    raw = np.frombuffer(body, dtype=np.uint8)
+    if raw.size == 0:
+        return np.empty(0, dtype=np.int64)
+
+    starts = row_starts(raw)
+    if starts.size == 0 or starts[-1] + TIMESTAMP_WIDTH > raw.size:
+        return None
+
+    chars = raw[starts[:, None] + np.arange(TIMESTAMP_WIDTH)]
+    separators = {4: '-', 7: '-', 10: ' ', 13: ':', 16: ':', 22: ':'}
+    for pos, char in separators.items():
+        if not (chars[:, pos] == ord(char)).all():
+            return None
+    sign_char = chars[:, 19]
+    if not ((sign_char == ord('+')) | (sign_char == ord('-'))).all():
+        return None
+    offset_digits = chars[:, [20, 21, 23, 24]].astype(np.int64) - ord('0')
+    if ((offset_digits < 0) | (offset_digits > 9)).any():
+        return None
+
+    try:
+        local = np.ascontiguousarray(chars[:, :19]).view('S19').ravel().astype('datetime64[s]')
+    except ValueError:
+        return None
+
+    offset = (offset_digits[:, 0] * 10 + offset_digits[:, 1]) * 3600 + (offset_digits[:, 2] * 10 + offset_digits[:, 3]) * 60
+    offset = np.where(sign_char == ord('+'), offset, -offset)
+    return (local.astype(np.int64) - offset) * 1_000_000_000
+
+
+def read_yfinance_csv(filepath):
+    """Single-pass reader for the three-line yfinance CSV layout.
+
+    Skips the Price/Ticker/Date header block by position, decodes the
+    timestamps straight from the bytes and lets the C parser read the
+    numeric columns with explicit float64 dtypes. Returns None when the
+    file does not look like that layout so the caller can fall back to
+    the generic cleaning path.
+    """
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+
+    parts = raw.split(b'\n', 3)
+    if len(parts) < 4 or any(not line.startswith(prefix) for line, prefix in zip(parts, YFINANCE_HEADER)):
+        return None
+
+    stock_data = parse_rows(parts[3])
+    if stock_data is None:
+        return None
+    stock_data = stock_data.dropna(how='all', subset=PRICE_COLUMNS)
+    if not stock_data.index.is_monotonic_increasing:
+        stock_data = stock_data.sort_index()
+    return stock_data
+
+
+def parse_rows(body):
+    """Parse headerless "timestamp,prices...,volume" rows into a price frame, or None"""
+    dates = parse_timestamps(body)
+    if dates is None:
+        return None
+
+    try:
+        numeric = pd.read_csv(
+            io.BytesIO(body),
+            header=None,
+            names=['Date'] + PRICE_COLUMNS,
+            usecols=PRICE_COLUMNS,
+            dtype={col: np.float64 for col in PRICE_COLUMNS},
+            engine='c'
+        )
+    except (ValueError, pd.errors.ParserError):
+        return None
+    if len(numeric) != len(dates):
+        return None
+
+    volume = numeric['Volume'].to_numpy()
+    if is_whole(volume):
+        numeric['Volume'] = volume.astype(np.int64)
+
+    return numeric.set_index(
+        pd.DatetimeIndex(dates.view('datetime64[ns]'), name='Date').tz_localize('UTC')
+    )
+
+
+def parse_stock_csv(filepath, symbol, log=print):
+    """Parse and clean one yfinance CSV into a Date-indexed price frame.
+
+    Returns None when nothing usable is left after cleaning. Progress goes
+    through `log` so pool workers can hand their output back to the parent.
+    """
+    log(f"🔄 Processing {symbol}...")
+
+    stock_data = read_yfinance_csv(filepath)
+    if stock_data is not None:
+        if stock_data.empty:
+            log(f"  ❌ No data rows found for {symbol}")
+            return None
+        log(f"  ✅ Fast-parsed {symbol}: {len(stock_data)} rows")
+        log(f"     📅 Date range: {stock_data.index.min().strftime('%Y-%m-%d')} to {stock_data.index.max().strftime('%Y-%m-%d')}")
+        return stock_data
+
+    log(f"  ⚠️  {symbol} is not in the standard yfinance layout, using generic cleaning")
+
+    # Read the CSV file with the correct structure
+    # Skip first 3 rows to get past headers and ticker info
+    stock_data = pd.read_csv(
+        filepath, 
+        skiprows=3,  # Skip: Price headers, Ticker row, Date header
+        names=['Date', 'Adj_Close', 'Close', 'High', 'Low', 'Open', 'Volume']
+    )
+
+    log(f"  📄 Raw data shape: {stock_data.shape}")
+    log(f"  📅 First few dates: {stock_data['Date'].head(3).tolist()}")
+
+    # Remove any remaining header-like rows that might have slipped through
+    initial_rows = len(stock_data)
+    stock_data = stock_data[~stock_data['Date'].str.contains('Date', na=False, case=False)]
+    stock_data = stock_data[~stock_data['Date'].str.contains('Ticker', na=False, case=False)]
+    stock_data = stock_data[~stock_data['Date'].str.contains('Price', na=False, case=False)]
+
+    log(f"  🧹 After header cleaning: {len(stock_data)}/{initial_rows} rows")
+
+    if stock_data.empty:
+        log(f"  ❌ No data rows found for {symbol}")
+        return None
+
+    # Parse dates - your format is: "2020-01-02 00:00:00+00:00"
+    # This is already in ISO8601 format, so pandas should handle it well
+    try:
+        stock_data['Date'] = pd.to_datetime(stock_data['Date'], format='ISO8601', errors='coerce')
+        log(f"  ✅ Date parsing successful with ISO8601")
+    except Exception as e:
+        log(f"  ⚠️  ISO8601 failed, trying alternative method: {e}")
+        try:
+            # Remove timezone info and parse
+            cleaned_dates = stock_data['Date'].str.replace(r'\+\d{2}:\d{2}$', '', regex=True)
+            stock_data['Date'] = pd.to_datetime(cleaned_dates, errors='coerce')
+            log(f"  ✅ Date parsing successful with timezone removal")
+        except Exception as e2:
+            log(f"  ❌ All date parsing failed: {e2}")
+            return None
+
+    # Check date parsing success
+    valid_dates = stock_data['Date'].notna()
+    log(f"  📅 Valid dates: {valid_dates.sum()}/{len(stock_data)}")
+
+    if valid_dates.sum() == 0:
+        log(f"  ❌ No valid dates found for {symbol}")
+        return None
+
+    # Filter to valid dates only
+    stock_data = stock_data[valid_dates]
+
+    # Set date as index
+    stock_data.set_index('Date', inplace=True)
+
+    # Convert numeric columns
+    numeric_cols = ['Adj_Close', 'Close', 'High', 'Low', 'Open', 'Volume']
+    for col in numeric_cols:
+        if col in stock_data.columns:
+            before_conversion = stock_data[col].notna().sum()
+            stock_data[col] = pd.to_numeric(stock_data[col], errors='coerce')
+            after_conversion = stock_data[col].notna().sum()
+            log(f"    {col}: {after_conversion}/{before_conversion} valid values")
+
+    # Remove rows where all numeric columns are NaN
+    before_numeric_filter = len(stock_data)
+    stock_data = stock_data.dropna(how='all', subset=numeric_cols)
+    after_numeric_filter = len(stock_data)
+
+    log(f"  🔢 After numeric filtering: {after_numeric_filter}/{before_numeric_filter}")
+
+    if stock_data.empty:
+        log(f"  ❌ No valid data remaining for {symbol}")
+        return None
+
+    # Sort by date
+    stock_data.sort_index(inplace=True)
+
+    # Show summary
+    date_range = f"{stock_data.index.min().strftime('%Y-%m-%d')} to {stock_data.index.max().strftime('%Y-%m-%d')}"
+    log(f"  ✅ Successfully loaded {symbol}: {len(stock_data)} rows")
+    log(f"     📅 Date range: {date_range}")
+    log(f"     💹 Adj_Close range: ${stock_data['Adj_Close'].min():.2f} - ${stock_data['Adj_Close'].max():.2f}")
+
+    return stock_data
+
+
+def ingest_symbol(directory, symbol):
+    """Pool task: parse one symbol and return (symbol, frame, seconds, log lines)"""
+    log_lines = []
+    start = time.perf_counter()
+    filepath = os.path.join(directory, f"{symbol}.csv")
+    try:
+        stock_data = parse_stock_csv(filepath, symbol, log=log_lines.append)
+    except Exception as e:
+        log_lines.append(f"❌ Failed to load {symbol}: {e}")
+        log_lines.append(f"   Full error: {traceback.format_exc()}")
+        stock_data = None
+    return symbol, stock_data, time.perf_counter() - start, log_lines
+
+
+def ingest_symbols(directory, symbols, workers=1):
+    """Parse symbols serially or across a process pool, yielding results in order"""
+    if workers <= 1 or len(symbols) <= 1:
+        for symbol in symbols:
+            yield ingest_symbol(directory, symbol)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(symbols))) as pool:
+        yield from pool.map(ingest_symbol, [directory] * len(symbols), symbols)
+
+def store_path(directory):
+    return os.path.join(snapshot_dir(directory), STORE_NAME)
+
+
+def store_key(directory, symbols):
+    """Signature of the source CSVs a store was built from"""
+    key = {}
+    for symbol in symbols:
+        filepath = os.path.join(directory, f"{symbol}.csv")
+        try:
+            key[symbol] = source_signature(filepath)
+        except OSError:
+            continue
+    return key
+
+
+def is_whole(values):
+    if np.issubdtype(values.dtype, np.integer):
+        return True
+    return bool(np.isfinite(values).all() and (values == np.trunc(values)).all())
+
+
+def column_dtype(values, col, compact=False):
+    """Storage dtype for one price column.
+
+    Prices are float64, or float32 in compact mode. Volume is stored as an
+    integer whenever every value is whole (otherwise, e.g. with gaps, it
+    stays float64): int64, or uint32 in compact mode when it fits.
+    """
+    if col == 'Volume':
+        if not is_whole(values):
+            return np.dtype('<f8')
+        if compact and (values.size == 0 or (values.min() >= 0 and values.max() <= np.iinfo(np.uint32).max)):
+            return np.dtype('<u4')
+        return np.dtype('<i8')
+    return np.dtype('<f4') if compact else np.dtype('<f8')
+
+
+def compact_frame(stock_data):
+    """Copy of a price frame with float32 prices and the narrowest safe volume type.
+
+    Halves the resident size of the prices. Indicator maths still runs in
+    float64: pandas rolling/ewm accumulate in float64 and the panel
+    promotes its matrices, so only the stored values lose precision.
+    """
+    return stock_data.astype({
+        col: column_dtype(stock_data[col].to_numpy(), col, compact=True) for col in PRICE_COLUMNS
+    })
+
+
+def build_store(directory, frames, key, compact=False):
+    """Pack every symbol into one columnar file that workers can mmap.
+
+    Layout: magic, uint64 header length, JSON header, then one contiguous
+    64-byte aligned block per column per symbol. The file is written to a
+    temporary name and renamed so readers only ever see a complete store.
+    """
+    header = {"format": SNAPSHOT_FORMAT, "key": key, "compact": compact, "symbols": {}}
+    blocks = []
+    offset = 0
+    for symbol, stock_data in frames.items():
+        arrays = frame_to_arrays(stock_data)
+        columns = {}
+        for col in ["Date"] + PRICE_COLUMNS:
+            dtype = np.dtype('<i8') if col == "Date" else column_dtype(arrays[col], col, compact)
+            values = np.ascontiguousarray(arrays[col], dtype=dtype)
+            columns[col] = {"offset": offset, "dtype": dtype.str}
+            blocks.append((offset, values))
+            offset += -(-values.nbytes // STORE_ALIGN) * STORE_ALIGN
+        header["symbols"][symbol] = {"rows": len(stock_data), "columns": columns}
+
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    data_start = -(-(len(STORE_MAGIC) + 8 + len(header_bytes)) // STORE_ALIGN) * STORE_ALIGN
+
+    folder = snapshot_dir(directory)
+    os.makedirs(folder, exist_ok=True)
+    path = store_path(directory)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(STORE_MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for block_offset, values in blocks:
+            f.seek(data_start + block_offset)
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+def open_store(directory, key=None, compact=False):
+    """Map the shared store and return {symbol: DataFrame} backed by it.
+
+    Returns None when the store is missing, corrupt or was built from
+    different source files than `key` describes, or with the other
+    `compact` setting. The frames hold read-only
+    views into the mapping, so every worker shares the same physical pages.
+    """
+    path = store_path(directory)
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+                return None
+            (header_len,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        if header.get("format") != SNAPSHOT_FORMAT:
+            return None
+        if key is not None and header.get("key") != key:
+            return None
+        if header.get("compact", False) != compact:
+            return None
+        mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    except (OSError, ValueError, struct.error):
+        return None
+
+    data_start = -(-(len(STORE_MAGIC) + 8 + header_len) // STORE_ALIGN) * STORE_ALIGN
+    frames = {}
+    for symbol, entry in header["symbols"].items():
+        rows = entry["rows"]
+        arrays = {}
+        for col, info in entry["columns"].items():
+            dtype = np.dtype(info["dtype"])
+            start = data_start + info["offset"]
+            arrays[col] = mapped[start:start + rows * dtype.itemsize].view(dtype)
+        frames[symbol] = views_to_frame(arrays)
+    return frames
+
+
+def views_to_frame(arrays):
+    """Like arrays_to_frame, but wraps the column arrays without copying them"""
+    index = pd.DatetimeIndex(arrays["Date"].view('datetime64[ns]'), name='Date').tz_localize('UTC')
+    return pd.DataFrame(
+        {col: arrays[col] for col in PRICE_COLUMNS},
+        index=index,
+        copy=False
+    )
+
+
+def parse_date_bound(value, end=False):
+    """Query-string date -> UTC epoch-ns. A bare YYYY-MM-DD end date covers that whole day."""
+    value = value.strip()
+    ts = pd.Timestamp(value)
+    if ts is pd.NaT:
+        raise ValueError(f"invalid date '{value}'")
+    ts = ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+    ns = int(ts.as_unit('ns').value)
+    if end and len(value) == 10:
+        ns += 86_400_000_000_000 - 1
+    return ns
+
+
+def row_range(dates, start=None, end=None, lookback=0):
+    """Rows of a sorted int64 date array that fall in [start, end], found by binary search.
+
+    Returns (first, stop, warmup): the slice first:stop also includes up to
+    `lookback` rows before `start` so rolling indicators are fully warmed
+    up, and `warmup` is how many of those leading rows to drop afterwards.
+    """
+    lo = 0 if start is None else int(np.searchsorted(dates, start, side='left'))
+    stop = len(dates) if end is None else int(np.searchsorted(dates, end, side='right'))
+    stop = max(stop, lo)
+    first = max(0, lo - lookback)
+    return first, stop, lo - first
+
+
+def slice_frame(stock_data, start=None, end=None, lookback=0):
+    """Date-range slice of a frame or Series plus `lookback` warm-up rows: (slice, warmup)"""
+    if start is None and end is None:
+        return stock_data, 0
+    first, stop, warmup = row_range(frame_to_dates(stock_data), start, end, lookback)
+    return stock_data.iloc[first:stop], warmup
+
+
+def scan_sources(directory):
+    """{symbol: (mtime_ns, size)} for every upper-case SYMBOL.csv in directory"""
+    sources = {}
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return sources
+    for entry in entries:
+        symbol, ext = os.path.splitext(entry.name)
+        if ext.lower() != '.csv' or not symbol or symbol != symbol.upper():
+            continue
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        if entry.is_file():
+            sources[symbol] = (st.st_mtime_ns, st.st_size)
+    return sources
+
+
+def scan_universe(directory, preferred=(), sources=None):
+    """Symbols that have a CSV on disk, found from one directory listing.
+
+    Symbols in `preferred` keep their order at the front; anything else
+    that has been dropped into the directory follows alphabetically.
+    """
+    if sources is None:
+        sources = scan_sources(directory)
+    universe = [s for s in preferred if s in sources]
+    universe += sorted(s for s in sources if s not in set(preferred))
+    return universe
+
+
+class SourceWatcher(threading.Thread):
+    """Polls a data directory and reports added, changed and removed CSVs.
+
+    Polling a directory listing is cheap at this size and works the same on
+    every platform and filesystem (including the network mounts and
+    containers where inotify is unreliable).
+    """
+
+    def __init__(self, directory, on_change, interval=10.0):
+        super().__init__(name="price-source-watcher", daemon=True)
+        self.directory = directory
+        self.on_change = on_change
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._sources = scan_sources(directory)
+
+    def poll(self):
+        current = scan_sources(self.directory)
+        added = [s for s in current if s not in self._sources]
+        removed = [s for s in self._sources if s not in current]
+        changed = [s for s in current if s in self._sources and current[s] != self._sources[s]]
+        self._sources = current
+        if added or removed or changed:
+            self.on_change(added, changed, removed)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"❌ Source watcher error: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def frame_nbytes(stock_data):
+    return int(stock_data.memory_usage(index=True, deep=False).sum())
+
+
+class PriceData(Mapping):
+    """Symbol -> price frame mapping that loads symbols on first access.
+
+    Membership, iteration and len() describe the whole available universe,
+    while only recently used frames stay resident. A symbol whose loader
+    returns None leaves the universe. When `budget_bytes` is set, the least
+    recently used frames are dropped once the resident total goes over it
+    (the most recent one is always kept).
+
+    Loading runs outside the lock, so other symbols stay available while a
+    cold one is read; concurrent requests for the same symbol share one load.
+
+    Every symbol also carries a version number that changes whenever its
+    data does (but not when it is merely evicted and reloaded), so derived
+    results can be cached against it. Callables in `listeners` are called
+    with the symbol each time that happens, and those in `drop_listeners`
+    each time a symbol's frame stops being resident.
+    """
+
+    def __init__(self, loader, budget_bytes=0):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.resident_bytes = 0
+        self._universe = []
+        self._universe_set = frozenset()
+        self._frames = OrderedDict()
+        self._sizes = {}
+        self._versions = {}
+        self._version_counter = itertools.count(1)
+        self._loading = {}
+        self._lock = threading.RLock()
+        self.listeners = []
+        self.drop_listeners = []
+
+    def set_universe(self, symbols):
+        with self._lock:
+            self._universe = list(symbols)
+            self._universe_set = frozenset(self._universe)
+            for symbol in [s for s in self._loading if s not in self._universe_set]:
+                del self._loading[symbol]
+            for symbol in [s for s in self._frames if s not in self._universe_set]:
+                self.discard(symbol)
+            for symbol in [s for s in self._versions if s not in self._universe_set]:
+                del self._versions[symbol]
+                self._notify(symbol)
+
+    def __getitem__(self, symbol):
+        with self._lock:
+            frame = self._frames.get(symbol)
+            if frame is not None:
+                self._frames.move_to_end(symbol)
+                return frame
+            if symbol not in self._universe_set:
+                raise KeyError(symbol)
+            flight = self._loading.get(symbol)
+            leader = flight is None
+            if leader:
+                flight = self._loading[symbol] = Future()
+        if not leader:
+            frame = flight.result()
+            if frame is None:
+                raise KeyError(symbol)
+            return frame
+
+        try:
+            frame = self.loader(symbol)
+        except BaseException as e:
+            with self._lock:
+                if self._loading.get(symbol) is flight:
+                    del self._loading[symbol]
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            # A newer frame, invalidation or universe change during the load wins
+            if self._loading.get(symbol) is flight:
+                del self._loading[symbol]
+                if frame is None:
+                    self._remove(symbol)
+                else:
+                    self._store(symbol, frame)
+                    if symbol not in self._versions:
+                        self._versions[symbol] = next(self._version_counter)
+        flight.set_result(frame)
+        if frame is None:
+            raise KeyError(symbol)
+        return frame
+
+    def __setitem__(self, symbol, frame):
+        with self._lock:
+            self._loading.pop(symbol, None)
+            self._store(symbol, frame)
+            self._versions[symbol] = next(self._version_counter)
+            self._notify(symbol)
+
+    def invalidate(self, symbol):
+        """Drop a symbol whose source changed, so its next load counts as new data"""
+        with self._lock:
+            self._loading.pop(symbol, None)
+            self.discard(symbol)
+            if symbol in self._universe_set:
+                self._versions[symbol] = next(self._version_counter)
+            self._notify(symbol)
+
+    def _notify(self, symbol):
+        for listener in self.listeners:
+            listener(symbol)
+
+    def version(self, symbol):
+        with self._lock:
+            return self._versions.get(symbol, 0)
+
+    def _store(self, symbol, frame):
+        with self._lock:
+            if self._frames.pop(symbol, None) is not None:
+                self.resident_bytes -= self._sizes.pop(symbol)
+            if symbol not in self._universe_set:
+                self._universe.append(symbol)
+                self._universe_set = frozenset(self._universe)
+            self._frames[symbol] = frame
+            self._sizes[symbol] = frame_nbytes(frame)
+            self.resident_bytes += self._sizes[symbol]
+            self._evict()
+
+    def _remove(self, symbol):
+        """Take a symbol whose source does not load out of the universe"""
+        self._universe.remove(symbol)
+        self._universe_set = frozenset(self._universe)
+        if self._versions.pop(symbol, None) is not None:
+            self._notify(symbol)
+
+    def remove(self, symbol):
+        with self._lock:
+            self._loading.pop(symbol, None)
+            self.discard(symbol)
+            if symbol in self._universe_set:
+                self._remove(symbol)
+
+    def discard(self, symbol):
+        with self._lock:
+            if self._frames.pop(symbol, None) is not None:
+                self.resident_bytes -= self._sizes.pop(symbol)
+                self._dropped(symbol)
+
+    def _evict(self):
+        if not self.budget_bytes:
+            return
+        while self.resident_bytes > self.budget_bytes and len(self._frames) > 1:
+            symbol, _ = self._frames.popitem(last=False)
+            self.resident_bytes -= self._sizes.pop(symbol)
+            self._dropped(symbol)
+
+    def _dropped(self, symbol):
+        for listener in self.drop_listeners:
+            listener(symbol)
+
+    def peek(self, symbol):
+        """Resident frame for symbol, or None - never triggers a load"""
+        with self._lock:
+            return self._frames.get(symbol)
+
+    def resident(self):
+        with self._lock:
+            return list(self._frames)
+
+    def __contains__(self, symbol):
+        return symbol in self._universe_set
+
+    def __iter__(self):
+        return iter(list(self._universe))
+
+    def __len__(self):
+        return len(self._universe)
+
+
+class GrowableFrame:
+    """Column buffers with spare capacity, so appending rows never copies the history.
+
+    frame() wraps the filled part of the buffers in a DataFrame without
+    copying. Frames handed out earlier stay valid: appends only write past
+    their end, and a regrow moves to fresh buffers.
+    """
+
+    def __init__(self, stock_data):
+        arrays = frame_to_arrays(stock_data)
+        self.compact = arrays['Adj_Close'].dtype == np.float32
+        self.rows = len(stock_data)
+        capacity = self.rows + max(256, self.rows // 4)
+        self.arrays = {}
+        for name, values in arrays.items():
+            buffer = np.empty(capacity, dtype=values.dtype)
+            buffer[:self.rows] = values
+            self.arrays[name] = buffer
+
+    def append(self, new_rows):
+        arrays = frame_to_arrays(new_rows)
+        added = len(new_rows)
+        needed = self.rows + added
+        capacity = len(self.arrays["Date"])
+        for name, values in arrays.items():
+            buffer = self.arrays[name]
+            if name == "Date":
+                dtype = buffer.dtype
+            else:
+                # Keep compact buffers compact unless the new rows do not fit
+                dtype = np.result_type(buffer.dtype, column_dtype(values, name, self.compact))
+            if needed > capacity or dtype != buffer.dtype:
+                grown = np.empty(max(needed, capacity + capacity // 2), dtype=dtype)
+                grown[:self.rows] = buffer[:self.rows]
+                buffer = self.arrays[name] = grown
+            buffer[self.rows:needed] = values
+        self.rows = needed
+
+    def frame(self):
+        return views_to_frame({name: buffer[:self.rows] for name, buffer in self.arrays.items()})
+
+
+class IndicatorTrack:
+    """Streaming state of one indicator over a symbol's Adj_Close, plus all values so far"""
+
+    def __init__(self, name, params, prices):
+        self.state = indicators.STREAMING[name](**params)
+        self.rows = 0
+        self.values = None
+        self.extend(prices)
+
+    def extend(self, prices):
+        """Feed new prices (Adj_Close without NaNs); costs O(1) per price"""
+        block = np.array([self.state.update(price) for price in prices.tolist()], dtype=np.float64)
+        block = block.reshape(len(prices), -1)
+        needed = self.rows + len(block)
+        if self.values is None or needed > len(self.values):
+            grown = np.empty((needed + max(256, needed // 4), block.shape[1]), dtype=np.float64)
+            if self.values is not None:
+                grown[:self.rows] = self.values[:self.rows]
+            self.values = grown
+        self.values[self.rows:needed] = block
+        self.rows = needed
+
+    def result(self, index):
+        """Values in the shape the batch function returns, on the given dropna()'d index"""
+        parts = tuple(
+            pd.Series(self.values[:self.rows, k], index=index, name='Adj_Close', copy=False)
+            for k in range(self.values.shape[1])
+        )
+        return parts if len(parts) > 1 else parts[0]
+
+
+class AppendState:
+    """Where the last read of a symbol's CSV stopped, and the buffers it feeds.
+
+    `frame` is the symbol's current data: the loaded frame itself until
+    rows are first appended, then a view of the growable buffers, which
+    are only made at that point. `head` and `last_row` are the bytes at
+    the start of the file and of the row ending at `offset`, checked
+    before each read so a rewritten file is not extended.
+    """
+
+    def __init__(self, offset, last_date, frame, head, last_row):
+        self.offset = offset
+        self.last_date = last_date
+        self.frame = frame
+        self.buffer = None
+        self.head = head
+        self.last_row = last_row
+        self.indicators = {}
+
+    def track(self, name, **params):
+        """Indicator carried forward on every append, seeded from the history on first use"""
+        key = (name, tuple(sorted(params.items())))
+        track = self.indicators.get(key)
+        if track is None:
+            prices = self.frame['Adj_Close'].dropna().to_numpy(dtype=np.float64)
+            track = self.indicators[key] = IndicatorTrack(name, params, prices)
+        return track
+
+
+def last_date_ns(stock_data):
+    return int(frame_to_dates(stock_data.iloc[-1:])[0])
+
+
+def read_row_before(f, offset, block_size=4096):
+    """Bytes of the row that ends (with its newline) at offset"""
+    start = max(0, offset - block_size)
+    f.seek(start)
+    chunk = f.read(offset - start)
+    return chunk[chunk.rfind(b'\n', 0, len(chunk) - 1) + 1:]
+
+
+def rows_match(parsed, stock_data):
+    """True if freshly parsed rows hold stock_data's dates and values.
+
+    Values are compared to float32 precision, so compact frames match too.
+    """
+    if len(parsed) != len(stock_data) or (frame_to_dates(parsed) != frame_to_dates(stock_data)).any():
+        return False
+    return all(
+        np.allclose(parsed[col].to_numpy(dtype=np.float64), stock_data[col].to_numpy(dtype=np.float64),
+                    rtol=1e-6, atol=0, equal_nan=True)
+        for col in PRICE_COLUMNS
+    )
+
+
+def locate_row_end(filepath, last_date, block_size=65536):
+    """Byte offset just past the row stamped `last_date`, searching back from the end.
+
+    Reads only as much of the file as it takes to find that row, so the
+    cost follows the number of rows added since, not the history length.
+    """
+    with open(filepath, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        start = end
+        while start > 0:
+            start = max(0, start - block_size)
+            f.seek(start)
+            chunk = f.read(end - start)
+            if start == 0:
+                # Skip the header block
+                parts = chunk.split(b'\n', len(YFINANCE_HEADER))
+                if len(parts) <= len(YFINANCE_HEADER):
+                    return None
+                first = len(chunk) - len(parts[-1])
+            else:
+                # The first line of the chunk may be cut off
+                first = chunk.find(b'\n') + 1
+            last = chunk.rfind(b'\n') + 1
+            if first == 0 or last <= first:
+                continue
+
+            body = chunk[first:last]
+            dates = parse_timestamps(body)
+            if dates is None:
+                return None
+            if start > 0 and (dates.size == 0 or dates[0] > last_date):
+                continue
+            matches = np.flatnonzero(dates == last_date)
+            if matches.size == 0:
+                return None
+            raw = np.frombuffer(body, dtype=np.uint8)
+            newlines = np.flatnonzero(raw == ord('\n'))
+            row_end = newlines[np.searchsorted(newlines, row_starts(raw)[matches[-1]])]
+            return start + first + int(row_end) + 1
+    return None
+
+
+def append_new_rows(filepath, stock_data, state=None):
+    """Read the rows appended to filepath since stock_data was loaded.
+
+    Returns (frame, state, added). `frame` is stock_data itself when the
+    file has not grown. The first call locates the end of the loaded data
+    in the file and checks that row against the loaded one; later calls
+    resume from the offset kept in `state`, after checking that the start
+    of the file and the last row read are unchanged. Raises ValueError when
+    the file no longer extends the loaded data (truncated, rewritten, or
+    the new rows are not valid and strictly later), in which case the
+    caller should reload the symbol from scratch.
+    """
+    with open(filepath, 'rb') as f:
+        if state is None:
+            last_date = last_date_ns(stock_data)
+            offset = locate_row_end(filepath, last_date)
+            if offset is None:
+                raise ValueError("loaded data not found in file")
+            last_row = read_row_before(f, offset)
+            f.seek(0)
+            head = f.read(min(offset, PREFIX_CHECK_BYTES))
+            parts = head.split(b'\n', len(YFINANCE_HEADER) + 1)
+            first_row = parts[-2] + b'\n' if len(parts) == len(YFINANCE_HEADER) + 2 else b''
+            for row, loaded in ((last_row, stock_data.iloc[-1:]), (first_row, stock_data.iloc[:1])):
+                parsed = parse_rows(row) if row else None
+                if row and (parsed is None or not rows_match(parsed, loaded)):
+                    raise ValueError("file no longer matches the loaded data")
+            state = AppendState(offset, last_date, stock_data, head, last_row)
+
+        size = f.seek(0, os.SEEK_END)
+        if size < state.offset:
+            raise ValueError("file shrank")
+        f.seek(0)
+        if f.read(len(state.head)) != state.head or read_row_before(f, state.offset) != state.last_row:
+            raise ValueError("file was rewritten")
+
+        f.seek(state.offset)
+        tail = f.read(size - state.offset)
+
+    # Leave a partially written last line for the next refresh
+    complete = tail.rfind(b'\n') + 1
+    tail = tail[:complete]
+    if not tail.strip():
+        return state.frame, state, 0
+
+    new_rows = parse_rows(tail)
+    if new_rows is None:
+        raise ValueError("appended rows are not in the expected layout")
+    new_dates = new_rows.index.as_unit('ns').asi8
+    if new_dates[0] <= state.last_date or (np.diff(new_dates) <= 0).any():
+        raise ValueError("appended rows are not strictly after the loaded data")
+
+    if state.buffer is None:
+        state.buffer = GrowableFrame(state.frame)
+    state.buffer.append(new_rows)
+    state.offset += complete
+    state.last_date = int(new_dates[-1])
+    state.last_row = tail[tail.rfind(b'\n', 0, len(tail) - 1) + 1:]
+    state.frame = state.buffer.frame()
+    if state.indicators:
+        prices = new_rows['Adj_Close'].dropna().to_numpy(dtype=np.float64)
+        for track in state.indicators.values():
+            track.extend(prices)
+    return state.frame, state, len(new_rows)
+
+
+class PricePanel:
+    """Dates x symbols matrices for each field on one shared calendar.
+
+    The calendar is the union of every symbol's dates; a symbol's missing
+    days are NaN and `mask(field)` marks the real observations. Matrices
+    are built per field on first use and stored column-major, so selecting
+    a subset of symbols is a column slice and the cross-symbol helpers
+    below run as one vectorized operation instead of a loop over symbols.
+    """
+
+    def __init__(self, frames, key=None):
+        self.key = key
+        self.symbols = list(frames)
+        self.columns = {symbol: j for j, symbol in enumerate(self.symbols)}
+        self._frames = frames
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+        symbol_dates = {s: frame_to_dates(df) for s, df in frames.items()}
+        if symbol_dates:
+            self.dates = np.unique(np.concatenate(list(symbol_dates.values())))
+        else:
+            self.dates = np.empty(0, dtype=np.int64)
+        self._positions = {s: np.searchsorted(self.dates, d) for s, d in symbol_dates.items()}
+        self.index = pd.DatetimeIndex(self.dates.view('datetime64[ns]'), name='Date').tz_localize('UTC')
+
+    def matrix(self, field='Adj_Close'):
+        """Full dates x symbols float64 matrix for field (NaN where a symbol has no row)"""
+        with self._lock:
+            values = self._matrices.get(field)
+            if values is None:
+                values = np.full((len(self.dates), len(self.symbols)), np.nan, order='F')
+                for symbol, df in self._frames.items():
+                    values[self._positions[symbol], self.columns[symbol]] = df[field].to_numpy(dtype=np.float64)
+                values.flags.writeable = False
+                self._matrices[field] = values
+            return values
+
+    def rows(self, start=None, end=None, lookback=0):
+        """Calendar rows for [start, end] plus warm-up: (slice, warmup), see row_range"""
+        first, stop, warmup = row_range(self.dates, start, end, lookback)
+        return slice(first, stop), warmup
+
+    def mask(self, field='Adj_Close', symbols=None, rows=None):
+        return ~np.isnan(self.select(field, symbols, rows))
+
+    def select(self, field='Adj_Close', symbols=None, rows=None):
+        values = self.matrix(field)
+        if rows is not None:
+            values = values[rows]
+        if symbols is None:
+            return values
+        return values[:, [self.columns[s] for s in symbols]]
+
+    def frame(self, field='Adj_Close', symbols=None, rows=None):
+        symbols = self.symbols if symbols is None else list(symbols)
+        index = self.index if rows is None else self.index[rows]
+        return pd.DataFrame(self.select(field, symbols, rows), index=index, columns=symbols, copy=False)
+
+    def returns(self, symbols=None, field='Adj_Close', rows=None):
+        """Simple returns between each symbol's consecutive observations.
+
+        Matches Series.dropna().pct_change() per symbol: gaps are bridged by
+        comparing with the last real value, and days without an observation
+        stay NaN.
+        """
+        symbols = self.symbols if symbols is None else list(symbols)
+        prices = self.frame(field, symbols, rows)
+        previous = prices.ffill().shift(1)
+        return (prices / previous - 1).where(prices.notna())
+
+    def rolling_mean(self, window, symbols=None, field='Adj_Close', rows=None):
+        """Rolling mean over each symbol's own observations, as Series.dropna().rolling().mean()"""
+        symbols = self.symbols if symbols is None else list(symbols)
+        prices = self.frame(field, symbols, rows)
+        if not self._has_gaps(prices):
+            return prices.rolling(window=window).mean()
+        return pd.DataFrame(
+            {s: prices[s].dropna().rolling(window=window).mean() for s in symbols},
+            index=prices.index
+        )
+
+    def indicators(self, requested, symbols=None, field='Adj_Close', rows=None):
+        """Indicators for many symbols at once: {name: DataFrame or tuple of DataFrames}.
+
+        `requested` is as for indicators.batch_indicators. Symbols are
+        computed together in one batch unless some have gaps in their
+        history, in which case those fall back to their own observations.
+        """
+        symbols = self.symbols if symbols is None else list(symbols)
+        prices = self.frame(field, symbols, rows)
+        index = prices.index
+
+        def to_frames(arrays, columns):
+            if isinstance(arrays, tuple):
+                return tuple(pd.DataFrame(part, index=index, columns=columns, copy=False) for part in arrays)
+            return pd.DataFrame(arrays, index=index, columns=columns, copy=False)
+
+        if not self._has_gaps(prices):
+            batch = indicators.batch_indicators(prices.to_numpy(), requested)
+            return {name: to_frames(result, symbols) for name, result in batch.items()}
+
+        results = {}
+        for name, params in requested.items():
+            per_symbol = {s: indicators.INDICATORS[name](prices[s].dropna(), **params) for s in symbols}
+            first = next(iter(per_symbol.values()), None)
+            if isinstance(first, tuple):
+                results[name] = tuple(
+                    pd.DataFrame({s: per_symbol[s][i] for s in symbols}, index=index)
+                    for i in range(len(first))
+                )
+            else:
+                results[name] = pd.DataFrame(per_symbol, index=index, columns=symbols)
+        return results
+
+    def correlation(self, symbols=None, field='Adj_Close', rows=None):
+        """Pairwise correlation of daily returns"""
+        return self.returns(symbols, field, rows).corr()
+
+    @staticmethod
+    def _has_gaps(prices):
+        """True if any column has a NaN between its first and last observation"""
+        valid = prices.notna().to_numpy()
+        if valid.size == 0:
+            return False
+        first = valid.argmax(axis=0)
+        last = len(valid) - 1 - valid[::-1].argmax(axis=0)
+        counts = valid.sum(axis=0)
+        return bool(((counts > 0) & (counts != last - first + 1)).any())
+
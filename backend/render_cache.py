@@ -0,0 +1,181 @@
+"""Rendered chart images, kept in memory and on disk by content key.
+
+A chart is fully determined by what was asked for (endpoint, symbols,
+graph type, parameters, date range, image options) and the exact data it
+was drawn from, so `render_key` hashes those into a digest that serves
+both as the cache key and as a strong ETag. Data is identified by a hash of
+its contents rather than an in-process version counter, so disk entries
+and ETags stay valid across restarts and between workers.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+# Bump when chart rendering changes, so cached images are not reused
+RENDER_VERSION = 2
+
+
+def frame_fingerprint(stock_data):
+    """Content hash of a price frame: its dates and every column's values"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(stock_data.index.as_unit('ns').asi8).tobytes())
+    for col in stock_data.columns:
+        values = np.ascontiguousarray(stock_data[col].to_numpy())
+        digest.update(col.encode('utf-8'))
+        digest.update(values.dtype.str.encode('ascii'))
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def render_key(kind, request_parts, fingerprints):
+    """Digest identifying one rendered image"""
+    payload = json.dumps([RENDER_VERSION, kind, request_parts, fingerprints], default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class RenderCache:
+    """Size-bounded LRU of image bytes in memory, backed by a size-bounded folder.
+
+    Disk entries are written atomically and the oldest are removed when
+    the folder grows past its budget; any worker can reuse them.
+    Concurrent misses for the same key share one render (render_once).
+    """
+
+    def __init__(self, max_bytes, folder=None, disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.folder = folder if disk_bytes else None
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key, mimetype):
+        return os.path.join(self.folder, f"{key}.{mimetype.split('/')[-1].split('+')[0]}")
+
+    def get(self, key, mimetype):
+        """Cached image bytes for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        if self.folder is not None:
+            path = self._path(key, mimetype)
+            try:
+                with open(path, 'rb') as f:
+                    body = f.read()
+                # Trimming removes the least recently used files first
+                os.utime(path)
+            except OSError:
+                body = None
+            if body is not None:
+                self._remember(key, body)
+                with self._lock:
+                    self.disk_hits += 1
+                return body
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, mimetype, body):
+        self._remember(key, body)
+        if self.folder is None:
+            return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            path = self._path(key, mimetype)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            self._trim_disk()
+        except OSError as e:
+            print(f"⚠️  Could not write render cache entry: {e}")
+
+    def render_once(self, key, mimetype, render):
+        """Bytes from render() for key, stored in the cache.
+
+        Call after get() missed. While one thread renders a key, others
+        asking for the same key wait for its result (or its exception)
+        instead of rendering it again.
+        """
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                # Rendered by another thread since the caller's get()
+                self.coalesced += 1
+                return body
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.result()
+
+        try:
+            body = render()
+            self.put(key, mimetype, body)
+            flight.set_result(body)
+            return body
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def _remember(self, key, body):
+        if self.max_bytes and len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = body
+            self.current_bytes += len(body)
+            while self.max_bytes and self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def _trim_disk(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.disk_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.disk_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "mb": round(self.current_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
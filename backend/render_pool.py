@@ -0,0 +1,106 @@
+"""Chart rendering in a fixed pool of worker processes.
+
+Matplotlib holds the GIL for the whole of a render, so rendering in the
+request thread stalls every other request the worker is serving. Jobs
+here are module-level functions from `charts` called with picklable
+arguments, run in separate processes, and the PNG bytes come back.
+
+Workers are forked as soon as the pool is created, which must happen
+before the app starts any threads, after fonts and mplfinance styles
+have been loaded once in the parent so every worker starts warm. Other
+start methods would re-run the server module (and its data loading) in
+each worker.
+
+At most `max_pending` jobs are queued or running; beyond that `render`
+raises RenderBusy at once instead of letting requests pile up.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import charts
+
+
+class RenderBusy(Exception):
+    """The render queue is full, or a render did not finish in time"""
+
+
+class RenderPool:
+    """Bounded render queue in front of `workers` processes (0 = render in the calling thread)"""
+
+    def __init__(self, workers, max_pending, timeout=None):
+        if workers > 0 and 'fork' not in multiprocessing.get_all_start_methods():
+            print("⚠️  Render workers need the fork start method; rendering in request threads")
+            workers = 0
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.jobs = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+        charts.warm_up()
+        if workers > 0:
+            self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+            # The first job forks every worker; do it now, while there are no other threads
+            self._executor.submit(int).result()
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def _run_inline(self, func, args):
+        try:
+            return func(*args)
+        finally:
+            self._release()
+
+    def render(self, func, *args):
+        """Result of func(*args), computed in a worker process"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise RenderBusy(f"Render queue is full ({self.max_pending} pending), try again shortly")
+        with self._lock:
+            self.pending += 1
+            self.jobs += 1
+
+        executor = self._executor
+        if executor is None:
+            return self._run_inline(func, args)
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._broken(executor)
+            return self._run_inline(func, args)
+        # The slot stays taken until the worker is done, even if we stop waiting
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise RenderBusy(f"Render did not finish within {self.timeout:g}s")
+        except BrokenProcessPool:
+            self._broken(executor)
+            return func(*args)
+
+    def _broken(self, executor):
+        # Forking again now would copy a process full of threads: render inline from here on
+        with self._lock:
+            if self._executor is executor:
+                print("❌ A render worker died; rendering in request threads from now on")
+                self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers if self._executor is not None else 0,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "jobs": self.jobs,
+                "rejected": self.rejected,
+            }
@@ -1,11 +1,19 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import matplotlib
-import mplfinance as mpf
-import io
 import os
+import threading
+import time
+from collections import OrderedDict
+import charts
+import downsample
+import indicators
+import price_store
+import render_cache
+import render_pool
+import wire_format
 
 # Use non-interactive backend
 matplotlib.use('Agg')
@@ -22,159 +30,778 @@ CORS(app, reources = {
 
 print("Starting unified Flask server with correct CSV format handling...")
 
-# Load data from CSV files
+# Load data from CSV files. Any other SYMBOL.csv found in the directory is
+# picked up too; these just keep their usual order at the front.
 stock_symbols = ["AAPL", "MSFT", "GOOG", "AMZN", "TSLA", "SPY", "NVDA", "META", "NFLX", "AMD"]
 directory = "Financial Data"
-data = {}
+
+# Binary snapshots of the parsed CSVs; set SNAPSHOT_CACHE=0 to always re-parse
+use_snapshot_cache = os.environ.get('SNAPSHOT_CACHE', '1') != '0'
+# One mmap'd columnar file shared by all workers; set SHARED_STORE=0 to keep
+# private per-process frames instead
+use_shared_store = os.environ.get('SHARED_STORE', '1') != '0'
+# Number of processes used to parse CSVs that have no valid snapshot (1 = serial)
+ingest_workers = max(1, int(os.environ.get('INGEST_WORKERS', '1')))
+# LAZY_LOAD=1 skips the startup load; symbols are parsed on first request instead
+lazy_load = os.environ.get('LAZY_LOAD', '0') == '1'
+# Resident price data budget in MB before cold symbols are evicted (0 = unlimited)
+price_cache_mb = float(os.environ.get('PRICE_CACHE_MB', '0'))
+# COMPACT_PRICES=1 keeps prices as float32 and volume as uint32 where it fits
+compact_prices = os.environ.get('COMPACT_PRICES', '0') == '1'
+# Seconds between scans of the data directory for changed/new files (0 = off)
+watch_interval = float(os.environ.get('WATCH_INTERVAL', '10'))
+
+# Charts render in RENDER_WORKERS processes (0 = in the request thread), with at most
+# RENDER_QUEUE renders queued or running; more get a 503. Workers are forked here,
+# before any threads start.
+render_workers = int(os.environ.get('RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+render_queue = max(1, int(os.environ.get('RENDER_QUEUE', str(4 * max(1, render_workers)))))
+render_timeout = float(os.environ.get('RENDER_TIMEOUT', '60'))
+# Finished line chart figures each render process keeps for reuse (0 = build every chart afresh)
+charts.max_templates = int(os.environ.get('FIGURE_TEMPLATES', '16'))
+renderer = render_pool.RenderPool(render_workers, render_queue, render_timeout)
+
+snapshot_manifest = None
+manifest_lock = threading.Lock()
+shared_frames = {}
+
+def prepare_frame(stock_data):
+    """Apply the configured storage mode to a freshly parsed or snapshot frame"""
+    if stock_data is None or not compact_prices:
+        return stock_data
+    return price_store.compact_frame(stock_data)
+
+def load_symbol(symbol):
+    """Loader behind `data` for a symbol that is not resident (or was evicted)"""
+    if symbol in shared_frames:
+        return shared_frames[symbol]
+    
+    filepath = os.path.join(directory, f"{symbol}.csv")
+    if not os.path.exists(filepath):
+        return None
+    
+    if snapshot_manifest is not None:
+        cached = price_store.read_snapshot(directory, symbol, filepath, snapshot_manifest)
+        if cached is not None:
+            return prepare_frame(cached)
+    
+    symbol, stock_data, elapsed, log_lines = price_store.ingest_symbol(directory, symbol)
+    for line in log_lines:
+        print(line)
+    print(f"  ⏱️  {symbol}: {elapsed * 1000:.0f} ms")
+    
+    if stock_data is not None and snapshot_manifest is not None:
+        try:
+            with manifest_lock:
+                price_store.write_snapshot(directory, symbol, filepath, stock_data, snapshot_manifest)
+                price_store.save_manifest(directory, snapshot_manifest)
+        except Exception as e:
+            print(f"  ⚠️  Could not write snapshot for {symbol}: {e}")
+    return prepare_frame(stock_data)
+
+data = price_store.PriceData(load_symbol, budget_bytes=int(price_cache_mb * 1024 * 1024))
+
+def has_symbol(symbol):
+    """True if symbol is in the universe and its data loads (loading it if cold)"""
+    try:
+        data[symbol]
+    except KeyError:
+        return False
+    return True
+
+def symbol_summary(symbol):
+    """Row count and date range for a symbol, without loading it if it is cold"""
+    df = data.peek(symbol)
+    if df is not None:
+        return {
+            "rows": len(df),
+            "date_range": f"{df.index.min().strftime('%Y-%m-%d')} to {df.index.max().strftime('%Y-%m-%d')}"
+        }
+    entry = (snapshot_manifest or {}).get("symbols", {}).get(symbol)
+    if entry is not None:
+        return {"rows": entry["rows"], "date_range": f"{entry['start']} to {entry['end']}"}
+    return {"rows": None, "date_range": None}
 
 def load_stock_data():
     """Load all CSV files into memory with correct format handling"""
+    global snapshot_manifest, shared_frames
     print("Loading stock data from CSV files...")
     
     if not os.path.exists(directory):
         print(f"❌ Directory '{directory}' not found!")
         return
     
-    for symbol in stock_symbols:
+    snapshot_manifest = price_store.load_manifest(directory) if use_snapshot_cache else None
+    manifest = snapshot_manifest
+    manifest_changed = False
+    
+    universe = price_store.scan_universe(directory, stock_symbols)
+    
+    shared = {}
+    if use_shared_store:
+        store_key = price_store.store_key(directory, universe)
+        shared = price_store.open_store(directory, store_key, compact=compact_prices) or {}
+        if shared:
+            print(f"⚡ Mapped {len(shared)} symbols from shared store")
+    shared_frames = shared
+    
+    data.set_universe(universe)
+    if lazy_load:
+        print(f"💤 Lazy loading enabled: {len(data)} symbols available, loaded on first request")
+        return
+    
+    pending = []
+    for symbol in universe:
         filepath = os.path.join(directory, f"{symbol}.csv")
-        if os.path.exists(filepath):
+        if symbol in shared:
+            data[symbol] = shared[symbol]
+            continue
+        if not os.path.exists(filepath):
+            print(f"❌ File not found: {filepath}")
+            data.remove(symbol)
+            continue
+        if manifest is not None:
+            cached = price_store.read_snapshot(directory, symbol, filepath, manifest)
+            if cached is not None:
+                data[symbol] = prepare_frame(cached)
+                print(f"⚡ Loaded {symbol} from snapshot: {len(cached)} rows")
+                continue
+        pending.append(symbol)
+    
+    if pending:
+        mode = f"{min(ingest_workers, len(pending))} processes" if ingest_workers > 1 else "serial"
+        print(f"🔄 Parsing {len(pending)} CSV files ({mode})...")
+    
+    ingest_start = time.perf_counter()
+    for symbol, stock_data, elapsed, log_lines in price_store.ingest_symbols(directory, pending, ingest_workers):
+        for line in log_lines:
+            print(line)
+        print(f"  ⏱️  {symbol}: {elapsed * 1000:.0f} ms")
+        
+        if stock_data is None:
+            data.remove(symbol)
+            continue
+        
+        # Store the cleaned data
+        data[symbol] = prepare_frame(stock_data)
+        
+        if manifest is not None:
+            filepath = os.path.join(directory, f"{symbol}.csv")
             try:
-                print(f"🔄 Processing {symbol}...")
-                
-                # Read the CSV file with the correct structure
-                # Skip first 3 rows to get past headers and ticker info
-                stock_data = pd.read_csv(
-                    filepath, 
-                    skiprows=3,  # Skip: Price headers, Ticker row, Date header
-                    names=['Date', 'Adj_Close', 'Close', 'High', 'Low', 'Open', 'Volume']
-                )
-                
-                print(f"  📄 Raw data shape: {stock_data.shape}")
-                print(f"  📅 First few dates: {stock_data['Date'].head(3).tolist()}")
-                
-                # Remove any remaining header-like rows that might have slipped through
-                initial_rows = len(stock_data)
-                stock_data = stock_data[~stock_data['Date'].str.contains('Date', na=False, case=False)]
-                stock_data = stock_data[~stock_data['Date'].str.contains('Ticker', na=False, case=False)]
-                stock_data = stock_data[~stock_data['Date'].str.contains('Price', na=False, case=False)]
-                
-                print(f"  🧹 After header cleaning: {len(stock_data)}/{initial_rows} rows")
-                
-                if stock_data.empty:
-                    print(f"  ❌ No data rows found for {symbol}")
-                    continue
-                
-                # Parse dates - your format is: "2020-01-02 00:00:00+00:00"
-                # This is already in ISO8601 format, so pandas should handle it well
+                price_store.write_snapshot(directory, symbol, filepath, stock_data, manifest)
+                manifest_changed = True
+            except Exception as e:
+                print(f"  ⚠️  Could not write snapshot for {symbol}: {e}")
+    
+    if pending:
+        print(f"⏱️  Parsed {len(pending)} CSV files in {time.perf_counter() - ingest_start:.2f}s")
+    
+    if manifest_changed:
+        try:
+            price_store.save_manifest(directory, manifest)
+        except Exception as e:
+            print(f"⚠️  Could not save snapshot manifest: {e}")
+    
+    if use_shared_store and data and not shared:
+        # Rebuild the shared file and swap this worker's private frames for views into it
+        try:
+            frames = {}
+            for symbol in data:
                 try:
-                    stock_data['Date'] = pd.to_datetime(stock_data['Date'], format='ISO8601', errors='coerce')
-                    print(f"  ✅ Date parsing successful with ISO8601")
-                except Exception as e:
-                    print(f"  ⚠️  ISO8601 failed, trying alternative method: {e}")
-                    try:
-                        # Remove timezone info and parse
-                        cleaned_dates = stock_data['Date'].str.replace(r'\+\d{2}:\d{2}$', '', regex=True)
-                        stock_data['Date'] = pd.to_datetime(cleaned_dates, errors='coerce')
-                        print(f"  ✅ Date parsing successful with timezone removal")
-                    except Exception as e2:
-                        print(f"  ❌ All date parsing failed: {e2}")
-                        continue
-                
-                # Check date parsing success
-                valid_dates = stock_data['Date'].notna()
-                print(f"  📅 Valid dates: {valid_dates.sum()}/{len(stock_data)}")
-                
-                if valid_dates.sum() == 0:
-                    print(f"  ❌ No valid dates found for {symbol}")
+                    frames[symbol] = data[symbol]
+                except KeyError:
                     continue
-                
-                # Filter to valid dates only
-                stock_data = stock_data[valid_dates]
-                
-                # Set date as index
-                stock_data.set_index('Date', inplace=True)
-                
-                # Convert numeric columns
-                numeric_cols = ['Adj_Close', 'Close', 'High', 'Low', 'Open', 'Volume']
-                for col in numeric_cols:
-                    if col in stock_data.columns:
-                        before_conversion = stock_data[col].notna().sum()
-                        stock_data[col] = pd.to_numeric(stock_data[col], errors='coerce')
-                        after_conversion = stock_data[col].notna().sum()
-                        print(f"    {col}: {after_conversion}/{before_conversion} valid values")
-                
-                # Remove rows where all numeric columns are NaN
-                before_numeric_filter = len(stock_data)
-                stock_data = stock_data.dropna(how='all', subset=numeric_cols)
-                after_numeric_filter = len(stock_data)
-                
-                print(f"  🔢 After numeric filtering: {after_numeric_filter}/{before_numeric_filter}")
-                
-                if stock_data.empty:
-                    print(f"  ❌ No valid data remaining for {symbol}")
-                    continue
-                
-                # Sort by date
-                stock_data.sort_index(inplace=True)
-                
-                # Store the cleaned data
-                data[symbol] = stock_data
-                
-                # Show summary
-                date_range = f"{stock_data.index.min().strftime('%Y-%m-%d')} to {stock_data.index.max().strftime('%Y-%m-%d')}"
-                print(f"  ✅ Successfully loaded {symbol}: {len(stock_data)} rows")
-                print(f"     📅 Date range: {date_range}")
-                print(f"     💹 Adj_Close range: ${stock_data['Adj_Close'].min():.2f} - ${stock_data['Adj_Close'].max():.2f}")
-                
-            except Exception as e:
-                print(f"❌ Failed to load {symbol}: {e}")
-                import traceback
-                print(f"   Full error: {traceback.format_exc()}")
-        else:
-            print(f"❌ File not found: {filepath}")
+            price_store.build_store(directory, frames, store_key, compact=compact_prices)
+            shared = price_store.open_store(directory, store_key, compact=compact_prices) or {}
+            shared_frames = shared
+            for symbol, df in shared.items():
+                data[symbol] = df
+            print(f"💾 Wrote shared store with {len(shared)} symbols")
+        except Exception as e:
+            print(f"⚠️  Could not build shared store: {e}")
     
-    print(f"\n📊 Successfully loaded {len(data)} symbols: {list(data.keys())}")
+    print(f"\n📊 Successfully loaded {len(data.resident())} symbols: {data.resident()}")
     
     # Show overall summary
     if data:
-        total_rows = sum(len(df) for df in data.values())
+        summaries = {symbol: symbol_summary(symbol) for symbol in data}
+        total_rows = sum(info["rows"] or 0 for info in summaries.values())
         print(f"📈 Total data points across all symbols: {total_rows}")
         
         # Show date ranges for all loaded symbols
         print("\n📅 Date ranges by symbol:")
-        for symbol, df in data.items():
-            print(f"  {symbol}: {df.index.min().strftime('%Y-%m-%d')} to {df.index.max().strftime('%Y-%m-%d')} ({len(df)} rows)")
+        for symbol, info in summaries.items():
+            print(f"  {symbol}: {info['date_range']} ({info['rows']} rows)")
+
+# Where each resident symbol's CSV was last read up to, for incremental refresh
+append_states = {}
+data.drop_listeners.append(lambda symbol: append_states.pop(symbol, None))
+refresh_lock = threading.Lock()
+
+def refresh_symbol(symbol):
+    """Pick up rows appended to a resident symbol's CSV; returns the number added.
+    
+    Only the new tail of the file is read and the rows go into spare buffer
+    capacity, so the cost follows the new rows. If the file was rewritten
+    rather than appended to, the symbol is dropped and reloaded in full.
+    Cold symbols are skipped: they are read fresh on their next access.
+    """
+    df = data.peek(symbol)
+    if df is None:
+        return 0
+    
+    filepath = os.path.join(directory, f"{symbol}.csv")
+    state = append_states.get(symbol)
+    if state is not None and state.frame is not df:
+        # The symbol was reloaded since the last refresh
+        state = None
+    
+    try:
+        new_df, state, added = price_store.append_new_rows(filepath, df, state)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  {symbol}: cannot append ({e}), reloading in full")
+        append_states.pop(symbol, None)
+        shared_frames.pop(symbol, None)
+        # Build the replacement before swapping it in, so requests always see a full frame
+        new_df = load_symbol(symbol)
+        if new_df is None:
+            data.discard(symbol)
+            raise
+        data[symbol] = new_df
+        return max(0, len(new_df) - len(df))
+    
+    append_states[symbol] = state
+    if added:
+        # The shared store and snapshot no longer match this symbol
+        shared_frames.pop(symbol, None)
+        data[symbol] = new_df
+        publish_streaming_indicators(symbol, state)
+        print(f"➕ {symbol}: appended {added} rows (now {len(new_df)})")
+    return added
+
+def publish_streaming_indicators(symbol, state):
+    """Cache the full-history default indicators the append state carries forward.
+    
+    The first append seeds them from the history; after that each new bar
+    updates them in O(1) instead of recomputing the whole series.
+    """
+    adj_close = state.frame['Adj_Close'].dropna()
+    results = {}
+    for name in indicators.STREAMING:
+        results[name] = state.track(name).result(adj_close.index)
+        key = indicator_window(symbol, name, None, None, {})[-1]
+        indicator_cache.put(key, results[name])
+    if precompute_indicators:
+        # SMA(20) is the middle Bollinger band
+        results['sma'] = results['bollinger_bands'][0]
+        default_indicators[symbol] = (data.version(symbol), results)
+
+def refresh_stock_data():
+    """Incrementally refresh every resident symbol"""
+    with refresh_lock:
+        results = {}
+        for symbol in data.resident():
+            try:
+                results[symbol] = refresh_symbol(symbol)
+            except Exception as e:
+                print(f"❌ Failed to refresh {symbol}: {e}")
+                results[symbol] = None
+        return results
+
+def handle_source_changes(added, changed, removed):
+    """Watcher callback: swap in new/changed symbols and drop deleted ones"""
+    with refresh_lock:
+        # A CSV that failed to load left the universe; a change may have fixed it
+        retried = [symbol for symbol in changed if symbol not in data]
+        if added or removed or retried:
+            for symbol in removed:
+                append_states.pop(symbol, None)
+                shared_frames.pop(symbol, None)
+            data.set_universe(price_store.scan_universe(directory, stock_symbols))
+            print(f"🔁 Universe now {len(data)} symbols (added {added}, removed {removed})")
+        
+        for symbol in changed:
+            if symbol in retried:
+                continue
+            if data.peek(symbol) is None:
+                # Cold symbol: its next load just has to skip the stale store view
+                shared_frames.pop(symbol, None)
+                data.invalidate(symbol)
+                continue
+            try:
+                refresh_symbol(symbol)
+            except Exception as e:
+                print(f"❌ Failed to refresh {symbol}: {e}")
+        
+        if not lazy_load:
+            for symbol in added + retried:
+                try:
+                    data[symbol]
+                except KeyError:
+                    print(f"❌ Could not load new symbol {symbol}")
+
+# Dates x symbols panels for the symbol sets requests ask about, least recently
+# used dropped first; a panel is rebuilt when one of its symbols gets new data
+max_panels = int(os.environ.get('PRICE_PANELS', '8'))
+price_panels = OrderedDict()
+panel_lock = threading.Lock()
+
+def get_panel(symbols):
+    """Aligned panel of the given symbols, reused until one of them gets new data"""
+    frames = {}
+    for symbol in sorted(set(symbols)):
+        try:
+            frames[symbol] = data[symbol]
+        except KeyError:
+            continue
+    names = tuple(frames)
+    key = tuple((symbol, data.version(symbol)) for symbol in names)
+    with panel_lock:
+        panel = price_panels.get(names)
+        if panel is not None and panel.key == key:
+            price_panels.move_to_end(names)
+            return panel
+        start = time.perf_counter()
+        panel = price_store.PricePanel(frames, key=key)
+        print(f"🧮 Built price panel: {len(panel.dates)} dates x {len(frames)} symbols in {(time.perf_counter() - start) * 1000:.0f} ms")
+        if max_panels > 0:
+            price_panels[names] = panel
+            # A panel keeps its frames alive: drop panels over symbols the store has evicted
+            resident = set(data.resident())
+            for stale in [other for other in price_panels if not resident.issuperset(other)]:
+                del price_panels[stale]
+            while len(price_panels) > max_panels:
+                price_panels.popitem(last=False)
+        return panel
+
+def start_source_watcher():
+    if watch_interval <= 0 or not os.path.exists(directory):
+        return None
+    watcher = price_store.SourceWatcher(directory, handle_source_changes, interval=watch_interval)
+    watcher.start()
+    print(f"👀 Watching '{directory}' for changes every {watch_interval:g}s")
+    return watcher
 
 # Load data on startup
 load_stock_data()
 
-# Technical analysis functions
-def calculate_rsi(series, window=14):
-    """Calculate Relative Strength Index"""
-    delta = series.diff(1)
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.rolling(window=window).mean()
-    avg_loss = loss.rolling(window=window).mean()
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-def calculate_bollinger_bands(series, window=20):
-    """Calculate Bollinger Bands"""
-    sma = series.rolling(window=window).mean()
-    std = series.rolling(window=window).std()
-    upper_band = sma + (2 * std)
-    lower_band = sma - (2 * std)
-    return sma, upper_band, lower_band
-
-def calculate_macd(series, short_window=12, long_window=26, signal_window=9):
-    """Calculate MACD"""
-    short_ema = series.ewm(span=short_window, adjust=False).mean()
-    long_ema = series.ewm(span=long_window, adjust=False).mean()
-    macd = short_ema - long_ema
-    signal = macd.ewm(span=signal_window, adjust=False).mean()
-    return macd, signal
+# Computed indicator series, keyed by symbol/indicator/params/data version/window
+indicator_cache_mb = float(os.environ.get('INDICATOR_CACHE_MB', '64'))
+indicator_cache = indicators.IndicatorCache(int(indicator_cache_mb * 1024 * 1024))
+data.listeners.append(indicator_cache.invalidate)
+
+# PRECOMPUTE_INDICATORS=1 computes the default indicators of every loaded symbol in
+# the background after startup, so the standard graphs become plain lookups
+precompute_indicators = os.environ.get('PRECOMPUTE_INDICATORS', '1') == '1'
+precompute_spec = ','.join(indicators.DEFAULT_INDICATORS) + ('|compact' if compact_prices else '|full')
+# symbol -> (data version, {name: full-history result with default params})
+default_indicators = {}
+data.listeners.append(lambda symbol: default_indicators.pop(symbol, None))
+data.drop_listeners.append(lambda symbol: default_indicators.pop(symbol, None))
+
+def precomputed_indicator(symbol, name, params, adj_close, first, stop):
+    """Stored default-parameter result, when the request is for the whole history"""
+    if params or first != 0 or stop != len(adj_close):
+        return None
+    entry = default_indicators.get(symbol)
+    if entry is None or entry[0] != data.version(symbol):
+        return None
+    return entry[1].get(name)
+
+def precompute_symbol(symbol):
+    """Fill default_indicators for one resident symbol; returns True if read from its snapshot"""
+    df = data.peek(symbol)
+    if df is None:
+        return False
+    version = data.version(symbol)
+    adj_close = df['Adj_Close'].dropna()
+    filepath = os.path.join(directory, f"{symbol}.csv")
+    
+    stored = None
+    if snapshot_manifest is not None:
+        stored = price_store.read_indicator_snapshot(directory, symbol, filepath, snapshot_manifest,
+                                                     precompute_spec, len(adj_close))
+    if stored is not None:
+        results = {}
+        for name, parts in stored.items():
+            series = tuple(pd.Series(part, index=adj_close.index, name=adj_close.name) for part in parts)
+            results[name] = series if len(series) > 1 else series[0]
+    else:
+        results = dict(zip(indicators.DEFAULT_INDICATORS,
+                           indicators.compute_many(adj_close, indicators.DEFAULT_INDICATORS)))
+        if snapshot_manifest is not None and data.version(symbol) == version:
+            try:
+                with manifest_lock:
+                    if price_store.write_indicator_snapshot(directory, symbol, results,
+                                                            snapshot_manifest, precompute_spec):
+                        price_store.save_manifest(directory, snapshot_manifest)
+            except Exception as e:
+                print(f"  ⚠️  Could not write indicator snapshot for {symbol}: {e}")
+    default_indicators[symbol] = (version, results)
+    return stored is not None
+
+def precompute_default_indicators():
+    """Background task: default indicators for every resident symbol"""
+    start = time.perf_counter()
+    done = from_snapshot = 0
+    for symbol in data.resident():
+        try:
+            from_snapshot += precompute_symbol(symbol)
+            done += 1
+        except Exception as e:
+            print(f"❌ Could not precompute indicators for {symbol}: {e}")
+    print(f"🧮 Precomputed default indicators for {done} symbols "
+          f"({from_snapshot} from snapshots) in {time.perf_counter() - start:.2f}s")
+
+def start_precompute():
+    if not precompute_indicators or not data.resident():
+        return None
+    thread = threading.Thread(target=precompute_default_indicators, name="precompute-indicators", daemon=True)
+    thread.start()
+    return thread
+
+def indicator_window(symbol, name, date_start, date_end, params):
+    """Prices, row window and cache key for one symbol's indicator request"""
+    adj_close = data[symbol]['Adj_Close'].dropna()
+    first, stop, warmup = price_store.row_range(
+        price_store.frame_to_dates(adj_close), date_start, date_end,
+        lookback=indicators.lookback(name, **params)
+    )
+    key = (symbol, name, tuple(sorted(params.items())), data.version(symbol), first, stop)
+    return adj_close, first, stop, warmup, key
+
+def compute_indicator(symbol, name, date_start=None, date_end=None, **params):
+    """Indicator for one symbol over [date_start, date_end], memoized per data version"""
+    adj_close, first, stop, warmup, key = indicator_window(symbol, name, date_start, date_end, params)
+    precomputed = precomputed_indicator(symbol, name, params, adj_close, first, stop)
+    if precomputed is not None:
+        return precomputed
+    
+    def compute():
+        result = indicators.INDICATORS[name](adj_close.iloc[first:stop], **params)
+        if isinstance(result, tuple):
+            return tuple(part.iloc[warmup:] for part in result)
+        return result.iloc[warmup:]
+    
+    return indicator_cache.get_or_compute(key, compute)
+
+def compute_indicators(symbols, name, date_start=None, date_end=None, **params):
+    """compute_indicator for several symbols: {symbol: result}.
+
+    Cached results are reused. Misses whose windows cover the same dates
+    are computed together in one batch over the price panel and cached per
+    symbol as usual; a symbol with its own window (e.g. one missing some
+    calendar days) is computed on its own, so it gets its full lookback.
+    """
+    results = {}
+    misses = {}
+    for symbol in symbols:
+        window = indicator_window(symbol, name, date_start, date_end, params)
+        cached = precomputed_indicator(symbol, name, params, *window[:3])
+        if cached is None:
+            cached = indicator_cache.get(window[-1])
+        if cached is not None:
+            results[symbol] = cached
+        else:
+            misses[symbol] = window
+    
+    groups = {}
+    for symbol, (adj_close, first, stop, warmup, key) in misses.items():
+        span = None
+        if first < stop:
+            dates = price_store.frame_to_dates(adj_close.iloc[[first, stop - 1]])
+            span = (int(dates[0]), int(dates[1]))
+        groups.setdefault(span, []).append(symbol)
+    
+    for span, group in groups.items():
+        if span is None or len(group) == 1:
+            for symbol in group:
+                results[symbol] = compute_indicator(symbol, name, date_start, date_end, **params)
+            continue
+        panel = get_panel(group)
+        rows = slice(int(np.searchsorted(panel.dates, span[0])), int(np.searchsorted(panel.dates, span[1], side='right')))
+        batch = panel.indicators({name: params}, group, rows=rows)[name]
+        for symbol in group:
+            adj_close, first, stop, warmup, key = misses[symbol]
+            index = adj_close.index[first + warmup:stop]
+            if isinstance(batch, tuple):
+                result = tuple(part[symbol].reindex(index).rename(adj_close.name) for part in batch)
+            else:
+                result = batch[symbol].reindex(index).rename(adj_close.name)
+            indicator_cache.put(key, result)
+            results[symbol] = result
+    
+    return {symbol: results[symbol] for symbol in symbols}
+
+def compute_indicator_set(symbol, requested, date_start=None, date_end=None):
+    """compute_indicator for several (name, params) pairs on one symbol, in order.
+    
+    Cached results are reused; misses over the same rows are evaluated in
+    one indicators.compute_many call, sharing their intermediates, and
+    cached as usual.
+    """
+    results = [None] * len(requested)
+    groups = {}
+    for i, (name, params) in enumerate(requested):
+        adj_close, first, stop, warmup, key = indicator_window(symbol, name, date_start, date_end, params)
+        cached = precomputed_indicator(symbol, name, params, adj_close, first, stop)
+        if cached is None:
+            cached = indicator_cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            groups.setdefault((first, stop), []).append((i, adj_close, warmup, key))
+    
+    for (first, stop), misses in groups.items():
+        adj_close = misses[0][1]
+        computed = indicators.compute_many(adj_close.iloc[first:stop], [requested[i] for i, _, _, _ in misses])
+        for (i, _, warmup, key), result in zip(misses, computed):
+            if isinstance(result, tuple):
+                result = tuple(part.iloc[warmup:] for part in result)
+            else:
+                result = result.iloc[warmup:]
+            indicator_cache.put(key, result)
+            results[i] = result
+    return results
+
+precompute_thread = start_precompute()
+# Started last: a detected change refreshes indicators and streams through the globals above
+source_watcher = start_source_watcher()
+
+def requested_range():
+    """Optional start/end query params as UTC epoch-ns bounds (None when absent)"""
+    start = request.args.get('start', '').strip()
+    end = request.args.get('end', '').strip()
+    start_ns = price_store.parse_date_bound(start) if start else None
+    end_ns = price_store.parse_date_bound(end, end=True) if end else None
+    if start_ns is not None and end_ns is not None and start_ns > end_ns:
+        raise ValueError("'start' is after 'end'")
+    return start_ns, end_ns
+
+graph_types = ['daily_returns', 'rolling_mean', 'bollinger_bands', 'rsi', 'macd']
+
+# Indicator behind each /stock/graph type that takes parameters
+graph_indicators = {
+    'rolling_mean': 'sma',
+    'bollinger_bands': 'bollinger_bands',
+    'rsi': 'rsi',
+    'macd': 'macd',
+}
+
+def requested_params(indicator):
+    """The indicator's parameters from the query string, validated and minus defaults"""
+    raw = {}
+    for param in indicators.PARAMETERS[indicator]:
+        value = request.args.get(param, '').strip()
+        if value:
+            raw[param] = value
+    return indicators.normalize_params(indicator, raw)
+
+def requested_series():
+    """Price fields and (indicator, params) pairs asked for by a series request.
+    
+    `fields` defaults to every price column and `indicators` to none.
+    Indicator parameters are prefixed with the indicator name, e.g.
+    sma_window=50 or bollinger_bands_num_std=2.5.
+    """
+    fields_param = request.args.get('fields', '').strip()
+    fields = [f.strip() for f in fields_param.split(',') if f.strip()] if fields_param else list(price_store.PRICE_COLUMNS)
+    unknown = [f for f in fields if f not in price_store.PRICE_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown fields {unknown}. Available: {price_store.PRICE_COLUMNS}")
+    
+    requested = []
+    for name in [n.strip() for n in request.args.get('indicators', '').split(',') if n.strip()]:
+        if name not in indicators.PARAMETERS:
+            raise ValueError(f"unknown indicator '{name}'. Available: {list(indicators.PARAMETERS)}")
+        raw = {}
+        for param in indicators.PARAMETERS[name]:
+            value = request.args.get(f"{name}_{param}", '').strip()
+            if value:
+                raw[param] = value
+        try:
+            requested.append((name, indicators.normalize_params(name, raw)))
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}")
+    return fields, requested
+
+def series_columns(stock_data, fields, results, max_points=None):
+    """Columns of a series response: epoch-ms dates, price fields, then indicators.
+    
+    `results` maps indicator names to their computed values; they are
+    aligned to the rows of stock_data (NaN where an indicator has none).
+    With max_points, rows are thinned with LTTB following the first column
+    after the dates, so every column keeps the same rows.
+    """
+    columns = {"dates": price_store.frame_to_dates(stock_data) // 1_000_000}
+    for field in fields:
+        columns[field] = stock_data[field].to_numpy()
+    for name, result in results.items():
+        parts = result if isinstance(result, tuple) else (result,)
+        labels = [f"{name}.{part}" for part in indicators.OUTPUTS[name]] if name in indicators.OUTPUTS else [name]
+        for label, part in zip(labels, parts):
+            columns[label] = part.reindex(stock_data.index).to_numpy()
+    if max_points is not None and len(columns) > 1:
+        columns = downsample.thin_columns(columns, list(columns)[1], max_points)
+    return columns
+
+def json_column(values):
+    """Plain list for JSON, with NaN as null"""
+    if values.dtype.kind == 'f':
+        missing = np.isnan(values)
+        if missing.any():
+            values = values.astype(object)
+            values[missing] = None
+    return values.tolist()
+
+def json_series(symbol, columns):
+    return {
+        "symbol": symbol,
+        "rows": len(columns["dates"]),
+        "columns": {name: json_column(values) for name, values in columns.items()},
+    }
+
+def requested_format():
+    """Response type for a series request: ?format= if given, else the Accept header.
+    
+    Returns None when the named format cannot be produced here (Arrow
+    without pyarrow installed).
+    """
+    name = request.args.get('format', '').strip().lower()
+    available = wire_format.available_mimetypes()
+    if name:
+        if name not in wire_format.FORMATS:
+            raise ValueError(f"unknown format '{name}'. Available: {list(wire_format.FORMATS)}")
+        mimetype = wire_format.FORMATS[name]
+        return mimetype if mimetype in available else None
+    return request.accept_mimetypes.best_match(available, default=wire_format.JSON_MIME)
+
+def series_response(series, mimetype, json_body):
+    """Encode [(symbol, columns)] as mimetype; json_body() builds the JSON variant"""
+    if mimetype == wire_format.PACKED_MIME:
+        length, chunks = wire_format.packed_chunks(series)
+        response = Response(chunks, mimetype=mimetype)
+        response.content_length = length
+    elif mimetype == wire_format.ARROW_MIME:
+        response = Response(wire_format.arrow_stream(series).to_pybytes(), mimetype=mimetype)
+    else:
+        response = jsonify(json_body())
+    response.vary.add('Accept')
+    return response
+
+# Rendered images: RENDER_CACHE_MB in memory plus RENDER_DISK_MB on disk (0 = no disk copy)
+render_cache_mb = float(os.environ.get('RENDER_CACHE_MB', '64'))
+render_disk_mb = float(os.environ.get('RENDER_DISK_MB', '256'))
+# Seconds browsers may reuse an image before revalidating it with its ETag
+render_max_age = int(os.environ.get('RENDER_MAX_AGE', '60'))
+image_cache = render_cache.RenderCache(
+    int(render_cache_mb * 1024 * 1024),
+    folder=os.path.join(price_store.snapshot_dir(directory), 'renders'),
+    disk_bytes=int(render_disk_mb * 1024 * 1024)
+)
+
+# symbol -> (data version, content hash) so each version is hashed once
+data_fingerprints = {}
+
+def data_fingerprint(symbol):
+    stock_data = data[symbol]
+    version = data.version(symbol)
+    cached = data_fingerprints.get(symbol)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    fingerprint = render_cache.frame_fingerprint(stock_data)
+    data_fingerprints[symbol] = (version, fingerprint)
+    return fingerprint
+
+def image_key(kind, symbols, *parts):
+    """Cache key and ETag for an image of `symbols` drawn with the given request parts"""
+    return render_cache.render_key(kind, [list(symbols), *parts], [data_fingerprint(s) for s in symbols])
+
+def image_response(key, body, mimetype='image/png'):
+    """Image (or 304 when body is None) with its ETag and caching headers"""
+    response = Response(status=304) if body is None else Response(body, mimetype=mimetype)
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = render_max_age
+    return response
+
+def cached_image(key, mimetype='image/png'):
+    """Response for an image the client or the cache already has, else None"""
+    if request.if_none_match.contains(key):
+        return image_response(key, None, mimetype)
+    body = image_cache.get(key, mimetype)
+    if body is not None:
+        return image_response(key, body, mimetype)
+    return None
+
+def render_image(key, render, mimetype='image/png'):
+    """Response for an image not in the cache: render() runs once for all concurrent requests for key"""
+    return image_response(key, image_cache.render_once(key, mimetype, render), mimetype)
+
+def busy_response(error):
+    """503 asking the client to retry once the render queue drains"""
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+# Chart images default to CHART_DPI at each chart's own size in inches (e.g.
+# 14x8 in = 1400x800 px at 100 dpi); width/height/dpi query params override it
+chart_dpi = int(os.environ.get('CHART_DPI', '100'))
+image_limits = {'width': (200, 4200), 'height': (150, 2400), 'dpi': (50, 300)}
+
+def requested_image(figsize):
+    """(figsize, dpi, format, exact_size) for a chart from ?width=&height=&dpi=&format=.
+
+    width and height are in pixels and the image comes out at exactly that
+    size; give one of them to keep the chart's aspect ratio. Without either
+    the image is cropped to the chart (exact_size False). Raises ValueError
+    for unknown or out-of-range values.
+    """
+    fmt = request.args.get('format', 'png').strip().lower()
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    if fmt not in charts.MIMETYPES:
+        raise ValueError(f"'format' must be one of {', '.join(charts.MIMETYPES)}, got {fmt!r}")
+    
+    values = {}
+    for name, (low, high) in image_limits.items():
+        value = request.args.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            values[name] = int(value)
+        except ValueError:
+            raise ValueError(f"'{name}' must be an integer, got {value!r}")
+        if not low <= values[name] <= high:
+            raise ValueError(f"'{name}' must be between {low} and {high}")
+    
+    dpi = values.get('dpi', chart_dpi)
+    width, height = values.get('width'), values.get('height')
+    if width is None and height is None:
+        return figsize, dpi, fmt, False
+    aspect = figsize[1] / figsize[0]
+    if width is None:
+        width = min(round(height / aspect), image_limits['width'][1])
+    if height is None:
+        height = min(round(width * aspect), image_limits['height'][1])
+    return (width / dpi, height / dpi), dpi, fmt, True
+
+def plot_points(figsize, dpi):
+    """Points worth drawing per line: about one per horizontal pixel of the image"""
+    return int(figsize[0] * dpi)
+
+def requested_max_points():
+    """Optional max_points query param for the series endpoints (None = every row)"""
+    value = request.args.get('max_points', '').strip()
+    if not value:
+        return None
+    try:
+        points = int(value)
+    except ValueError:
+        raise ValueError(f"'max_points' must be an integer, got {value!r}")
+    if not 3 <= points <= 100_000:
+        raise ValueError("'max_points' must be between 3 and 100000")
+    return points
 
 # Routes
 @app.route('/', methods=['GET'])
@@ -184,7 +811,7 @@ def home():
         "status": "OK",
         "loaded_symbols": len(data),
         "symbols": list(data.keys()),
-        "total_data_points": sum(len(df) for df in data.values()) if data else 0
+        "total_data_points": sum(symbol_summary(symbol)["rows"] or 0 for symbol in data)
     })
 
 @app.route('/health', methods=['GET'])
@@ -193,11 +820,14 @@ def health():
         "status": "healthy" if data else "no_data",
         "loaded_symbols": list(data.keys()),
         "total_symbols": len(data),
+        "resident_symbols": data.resident(),
+        "resident_mb": round(data.resident_bytes / (1024 * 1024), 2),
+        "indicator_cache": indicator_cache.stats(),
+        "precomputed_symbols": len(default_indicators),
+        "render_cache": image_cache.stats(),
+        "render_pool": renderer.stats(),
         "data_summary": {
-            symbol: {
-                "rows": len(df),
-                "date_range": f"{df.index.min().strftime('%Y-%m-%d')} to {df.index.max().strftime('%Y-%m-%d')}"
-            } for symbol, df in list(data.items())[:3]
+            symbol: symbol_summary(symbol) for symbol in list(data.keys())[:3]
         } if data else {}
     })
 
@@ -208,6 +838,94 @@ def get_symbols():
         "total_count": len(data)
     })
 
+@app.route('/refresh', methods=['POST'])
+def refresh():
+    """Append any new trading days found in the CSVs without a restart"""
+    results = refresh_stock_data()
+    return jsonify({
+        "appended_rows": {symbol: added for symbol, added in results.items() if added},
+        "failed": [symbol for symbol, added in results.items() if added is None],
+        "refreshed_symbols": len(results)
+    })
+
+def graph_spec(graph_type, symbols, date_start, date_end, params, settings, points):
+    """Line chart spec for a /stock/graph request"""
+    ops = []
+    
+    if graph_type == 'daily_returns':
+        panel = get_panel(symbols)
+        rows, warmup = panel.rows(date_start, date_end, lookback=1)
+        all_returns = panel.returns(symbols, rows=rows).iloc[warmup:]
+        for symbol in symbols:
+            returns = downsample.thin(all_returns[symbol].dropna(), points)
+            ops.append(('plot', (returns.index, returns * 100), dict(label=f'{symbol}', alpha=0.8, linewidth=1)))
+        
+        ops.append(('axhline', (), dict(y=0, color='black', linestyle='-', alpha=0.3)))
+        title, ylabel = 'Daily Returns (%)', 'Daily Return (%)'
+        
+    elif graph_type == 'rolling_mean':
+        window = settings['window']
+        rolling_means = compute_indicators(symbols, 'sma', date_start, date_end, **params)
+        for symbol in symbols:
+            rolling_mean = downsample.thin(rolling_means[symbol].dropna(), points)
+            ops.append(('plot', (rolling_mean.index, rolling_mean), dict(label=f'{symbol}', alpha=0.8, linewidth=1.5)))
+        
+        title, ylabel = f'{window}-Day Simple Moving Average', 'Price ($)'
+        
+    elif graph_type == 'bollinger_bands':
+        colors = ['blue', 'red', 'green', 'orange', 'purple']
+        bands = compute_indicators(symbols, 'bollinger_bands', date_start, date_end, **params)
+        for i, symbol in enumerate(symbols):
+            color = colors[i % len(colors)]
+            adj_close, _ = price_store.slice_frame(data[symbol]['Adj_Close'].dropna(), date_start, date_end)
+            adj_close = downsample.thin(adj_close, points)
+            sma, upper, lower = bands[symbol]
+            sma = downsample.thin(sma, points)
+            upper, lower = downsample.thin(upper, points, lower)
+            
+            ops.append(('plot', (adj_close.index, adj_close), dict(label=f'{symbol} Price', 
+                        color=color, alpha=0.7, linewidth=1)))
+            ops.append(('plot', (sma.index, sma), dict(label=f'{symbol} SMA', 
+                        color=color, alpha=0.8, linewidth=1.5, linestyle='--')))
+            ops.append(('fill_between', (upper.index, upper, lower), dict(alpha=0.1, color=color)))
+        
+        title = f"Bollinger Bands ({settings['window']}-day, {settings['num_std']:g}σ)"
+        ylabel = 'Price ($)'
+        
+    elif graph_type == 'rsi':
+        all_rsi = compute_indicators(symbols, 'rsi', date_start, date_end, **params)
+        for symbol in symbols:
+            rsi = downsample.thin(all_rsi[symbol], points)
+            ops.append(('plot', (rsi.index, rsi), dict(label=f'{symbol}', alpha=0.8, linewidth=1.5)))
+        
+        ops.append(('axhline', (), dict(y=70, color='red', linestyle='--', alpha=0.7, label='Overbought (70)')))
+        ops.append(('axhline', (), dict(y=30, color='red', linestyle='--', alpha=0.7, label='Oversold (30)')))
+        ops.append(('axhline', (), dict(y=50, color='gray', linestyle='-', alpha=0.3)))
+        title = f"Relative Strength Index (RSI {settings['window']})" if params else 'Relative Strength Index (RSI)'
+        ylabel = 'RSI'
+        
+    elif graph_type == 'macd':
+        all_macd = compute_indicators(symbols, 'macd', date_start, date_end, **params)
+        for symbol in symbols:
+            macd, signal = all_macd[symbol]
+            macd = downsample.thin(macd, points)
+            signal = downsample.thin(signal, points)
+            ops.append(('plot', (macd.index, macd), dict(label=f'{symbol} MACD', alpha=0.8, linewidth=1.5)))
+            ops.append(('plot', (signal.index, signal), dict(label=f'{symbol} Signal', alpha=0.8, linewidth=1, linestyle='--')))
+        
+        ops.append(('axhline', (), dict(y=0, color='black', linestyle='-', alpha=0.3)))
+        title = f"MACD ({settings['short_window']}, {settings['long_window']}, {settings['signal_window']})"
+        ylabel = 'MACD'
+    
+    return {
+        'title': title,
+        'ylabel': ylabel,
+        'xlabel': 'Date',
+        'ops': ops,
+        'ylim': (0, 100) if graph_type == 'rsi' else None,
+        'legend': True
+    }
+
 @app.route('/stock/graph', methods=['GET'])
 def stock_graph():
     print(f"\n📊 Graph request received")
@@ -226,104 +944,61 @@ def stock_graph():
     if not graph_type.strip():
         return jsonify({"error": "Missing 'graph_type' parameter"}), 400
     
+    if graph_type not in graph_types:
+        return jsonify({
+            "error": f"Invalid graph type: {graph_type}. Available: {', '.join(graph_types)}"
+        }), 400
+    
     # Parse and validate symbols
     symbols = [s.strip().upper() for s in symbols_param.split(',') if s.strip()]
-    valid_symbols = [s for s in symbols if s in data]
-    invalid_symbols = [s for s in symbols if s not in data]
+    valid_symbols = [s for s in symbols if has_symbol(s)]
+    invalid_symbols = [s for s in symbols if s not in valid_symbols]
     
     if not valid_symbols:
         return jsonify({
             "error": f"No valid symbols. Invalid: {invalid_symbols}. Available: {list(data.keys())}"
         }), 400
     
+    try:
+        date_start, date_end = requested_range()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {e}"}), 400
+    
+    indicator = graph_indicators.get(graph_type)
+    try:
+        params = requested_params(indicator) if indicator else {}
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    settings = indicators.resolved_params(indicator, params) if indicator else {}
+    
+    try:
+        figsize, dpi, fmt, exact_size = requested_image((14, 8))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid image option: {e}"}), 400
+    mimetype = charts.MIMETYPES[fmt]
+    
+    key = image_key('graph', valid_symbols, graph_type, sorted(params.items()), date_start, date_end, figsize, dpi, fmt, exact_size)
+    cached = cached_image(key, mimetype)
+    if cached is not None:
+        print(f"⚡ Served cached {graph_type} for {valid_symbols}")
+        return cached
+    
     print(f"✅ Processing symbols: {valid_symbols}")
     
     try:
-        plt.figure(figsize=(14, 8))
-        plt.style.use('default')  # Ensure consistent styling
-        
-        if graph_type == 'daily_returns':
-            for symbol in valid_symbols:
-                adj_close = data[symbol]['Adj_Close'].dropna()
-                returns = adj_close.pct_change().dropna()
-                plt.plot(returns.index, returns * 100, label=f'{symbol}', alpha=0.8, linewidth=1)
-            
-            plt.title('Daily Returns (%)', fontsize=16, fontweight='bold')
-            plt.ylabel('Daily Return (%)', fontsize=12)
-            plt.axhline(y=0, color='black', linestyle='-', alpha=0.3)
-            
-        elif graph_type == 'rolling_mean':
-            window = 20
-            for symbol in valid_symbols:
-                adj_close = data[symbol]['Adj_Close'].dropna()
-                rolling_mean = adj_close.rolling(window=window).mean()
-                plt.plot(rolling_mean.index, rolling_mean, label=f'{symbol}', alpha=0.8, linewidth=1.5)
-            
-            plt.title(f'{window}-Day Simple Moving Average', fontsize=16, fontweight='bold')
-            plt.ylabel('Price ($)', fontsize=12)
-            
-        elif graph_type == 'bollinger_bands':
-            colors = ['blue', 'red', 'green', 'orange', 'purple']
-            for i, symbol in enumerate(valid_symbols):
-                color = colors[i % len(colors)]
-                adj_close = data[symbol]['Adj_Close'].dropna()
-                sma, upper, lower = calculate_bollinger_bands(adj_close)
-                
-                plt.plot(adj_close.index, adj_close, label=f'{symbol} Price', 
-                        color=color, alpha=0.7, linewidth=1)
-                plt.plot(sma.index, sma, label=f'{symbol} SMA', 
-                        color=color, alpha=0.8, linewidth=1.5, linestyle='--')
-                plt.fill_between(adj_close.index, upper, lower, alpha=0.1, color=color)
-            
-            plt.title('Bollinger Bands (20-day, 2σ)', fontsize=16, fontweight='bold')
-            plt.ylabel('Price ($)', fontsize=12)
-            
-        elif graph_type == 'rsi':
-            for symbol in valid_symbols:
-                adj_close = data[symbol]['Adj_Close'].dropna()
-                rsi = calculate_rsi(adj_close)
-                plt.plot(rsi.index, rsi, label=f'{symbol}', alpha=0.8, linewidth=1.5)
-            
-            plt.axhline(y=70, color='red', linestyle='--', alpha=0.7, label='Overbought (70)')
-            plt.axhline(y=30, color='red', linestyle='--', alpha=0.7, label='Oversold (30)')
-            plt.axhline(y=50, color='gray', linestyle='-', alpha=0.3)
-            plt.title('Relative Strength Index (RSI)', fontsize=16, fontweight='bold')
-            plt.ylabel('RSI', fontsize=12)
-            plt.ylim(0, 100)
-            
-        elif graph_type == 'macd':
-            for symbol in valid_symbols:
-                adj_close = data[symbol]['Adj_Close'].dropna()
-                macd, signal = calculate_macd(adj_close)
-                plt.plot(macd.index, macd, label=f'{symbol} MACD', alpha=0.8, linewidth=1.5)
-                plt.plot(signal.index, signal, label=f'{symbol} Signal', alpha=0.8, linewidth=1, linestyle='--')
-            
-            plt.axhline(y=0, color='black', linestyle='-', alpha=0.3)
-            plt.title('MACD (12, 26, 9)', fontsize=16, fontweight='bold')
-            plt.ylabel('MACD', fontsize=12)
-            
-        else:
-            return jsonify({
-                "error": f"Invalid graph type: {graph_type}. Available: daily_returns, rolling_mean, bollinger_bands, rsi, macd"
-            }), 400
-        
-        # Common formatting
-        plt.xlabel('Date', fontsize=12)
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        
-        # Save plot
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight', facecolor='white')
-        buf.seek(0)
-        plt.close()
+        points = plot_points(figsize, dpi)
+        response = render_image(key, lambda: renderer.render(
+            charts.line_chart,
+            graph_spec(graph_type, valid_symbols, date_start, date_end, params, settings, points),
+            figsize, dpi, fmt, exact_size
+        ), mimetype)
         
         print(f"✅ Successfully generated {graph_type} for {valid_symbols}")
-        return send_file(buf, mimetype='image/png')
+        return response
         
+    except render_pool.RenderBusy as e:
+        return busy_response(e)
     except Exception as e:
-        plt.close()
         error_msg = f"Error generating plot: {str(e)}"
         print(f"❌ {error_msg}")
         return jsonify({"error": error_msg}), 500
@@ -333,33 +1008,50 @@ def get_candlestick_chart(ticker):
     """Generate candlestick chart"""
     ticker = ticker.upper()
     
-    if not data or ticker not in data:
+    if not data or not has_symbol(ticker):
         return jsonify({"error": f"Symbol {ticker} not found"}), 404
     
+    try:
+        date_start, date_end = requested_range()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {e}"}), 400
+    
+    try:
+        figsize, dpi, fmt, exact_size = requested_image(charts.CANDLE_FIGSIZE)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid image option: {e}"}), 400
+    mimetype = charts.MIMETYPES[fmt]
+    
+    key = image_key('chart', [ticker], date_start, date_end, figsize, dpi, fmt, exact_size)
+    cached = cached_image(key, mimetype)
+    if cached is not None:
+        return cached
+    
     try:
         stock_data = data[ticker]
         ohlc_data = stock_data[['Open', 'High', 'Low', 'Close', 'Volume']].dropna()
+        ohlc_data, _ = price_store.slice_frame(ohlc_data, date_start, date_end)
+        
+        if ohlc_data.empty:
+            return jsonify({"error": f"No data for {ticker} in the requested date range"}), 404
         
         if len(ohlc_data) > 500:  # Limit for performance
             ohlc_data = ohlc_data.tail(500)
         
-        buf = io.BytesIO()
-        mpf.plot(
-            ohlc_data,
-            type='candle',
-            style='charles',
-            title=f'{ticker} Candlestick Chart (Last {len(ohlc_data)} days)',
-            ylabel='Price ($)',
-            volume=True,
-            figratio=(14, 8),
-            figscale=1.0,
-            savefig=dict(fname=buf, format='png', dpi=300, bbox_inches='tight')
-        )
-        buf.seek(0)
+        if date_start is None and date_end is None:
+            title = f'{ticker} Candlestick Chart (Last {len(ohlc_data)} days)'
+        else:
+            title = f"{ticker} Candlestick Chart ({ohlc_data.index[0].strftime('%Y-%m-%d')} to {ohlc_data.index[-1].strftime('%Y-%m-%d')})"
+        
+        response = render_image(key, lambda: renderer.render(
+            charts.candlestick_chart, ohlc_data, title, dpi, figsize, fmt, exact_size
+        ), mimetype)
         
         print(f"✅ Generated candlestick chart for {ticker}")
-        return send_file(buf, mimetype='image/png')
+        return response
         
+    except render_pool.RenderBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({"error": f"Error generating candlestick: {str(e)}"}), 500
 
@@ -368,33 +1060,119 @@ def get_trading_volume(ticker):
     """Generate volume chart"""
     ticker = ticker.upper()
     
-    if not data or ticker not in data:
+    if not data or not has_symbol(ticker):
         return jsonify({"error": f"Symbol {ticker} not found"}), 404
     
+    try:
+        date_start, date_end = requested_range()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {e}"}), 400
+    
+    try:
+        figsize, dpi, fmt, exact_size = requested_image((14, 7))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid image option: {e}"}), 400
+    mimetype = charts.MIMETYPES[fmt]
+    
+    key = image_key('volume', [ticker], date_start, date_end, figsize, dpi, fmt, exact_size)
+    cached = cached_image(key, mimetype)
+    if cached is not None:
+        return cached
+    
     try:
         volume_data = data[ticker]['Volume'].dropna()
+        volume_data, _ = price_store.slice_frame(volume_data, date_start, date_end)
+        
+        if volume_data.empty:
+            return jsonify({"error": f"No data for {ticker} in the requested date range"}), 404
         
-        plt.figure(figsize=(14, 7))
-        plt.plot(volume_data.index, volume_data, color='steelblue', alpha=0.7, linewidth=1)
-        plt.fill_between(volume_data.index, volume_data, alpha=0.3, color='steelblue')
-        plt.title(f'{ticker} Trading Volume', fontsize=16, fontweight='bold')
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Volume', fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
+        volume_data = downsample.thin(volume_data, plot_points(figsize, dpi))
         
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight', facecolor='white')
-        buf.seek(0)
-        plt.close()
+        response = render_image(key, lambda: renderer.render(charts.line_chart, {
+            'title': f'{ticker} Trading Volume',
+            'ylabel': 'Volume',
+            'xlabel': 'Date',
+            'ops': [
+                ('plot', (volume_data.index, volume_data), dict(color='steelblue', alpha=0.7, linewidth=1)),
+                ('fill_between', (volume_data.index, volume_data), dict(alpha=0.3, color='steelblue'))
+            ]
+        }, figsize, dpi, fmt, exact_size), mimetype)
         
         print(f"✅ Generated volume chart for {ticker}")
-        return send_file(buf, mimetype='image/png')
+        return response
         
+    except render_pool.RenderBusy as e:
+        return busy_response(e)
     except Exception as e:
-        plt.close()
         return jsonify({"error": f"Error generating volume chart: {str(e)}"}), 500
 
+@app.route('/api/stocks/<ticker>/series', methods=['GET'])
+def get_series(ticker):
+    """Price and indicator series as columnar JSON for client-side charting"""
+    ticker = ticker.upper()
+    
+    if not data or not has_symbol(ticker):
+        return jsonify({"error": f"Symbol {ticker} not found"}), 404
+    
+    try:
+        date_start, date_end = requested_range()
+        fields, requested = requested_series()
+        max_points = requested_max_points()
+        mimetype = requested_format()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    if mimetype is None:
+        return jsonify({"error": "Requested format is not available on this server"}), 406
+    
+    try:
+        stock_data, _ = price_store.slice_frame(data[ticker], date_start, date_end)
+        if stock_data.empty:
+            return jsonify({"error": f"No data for {ticker} in the requested date range"}), 404
+        
+        results = dict(zip([name for name, _ in requested], compute_indicator_set(ticker, requested, date_start, date_end)))
+        columns = series_columns(stock_data, fields, results, max_points)
+        return series_response([(ticker, columns)], mimetype, lambda: json_series(ticker, columns))
+        
+    except Exception as e:
+        return jsonify({"error": f"Error building series: {str(e)}"}), 500
+
+@app.route('/api/stocks/series', methods=['GET'])
+def get_multi_series():
+    """Columnar series for several symbols at once, each on its own dates"""
+    symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if not symbols:
+        return jsonify({"error": "Missing 'symbols' parameter"}), 400
+    
+    symbols = list(dict.fromkeys(symbols))
+    invalid_symbols = [s for s in symbols if not has_symbol(s)]
+    if invalid_symbols:
+        return jsonify({"error": f"Unknown symbols: {invalid_symbols}. Available: {list(data.keys())}"}), 404
+    
+    try:
+        date_start, date_end = requested_range()
+        fields, requested = requested_series()
+        max_points = requested_max_points()
+        mimetype = requested_format()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    if mimetype is None:
+        return jsonify({"error": "Requested format is not available on this server"}), 406
+    
+    try:
+        computed = {name: compute_indicators(symbols, name, date_start, date_end, **params) for name, params in requested}
+        series = []
+        for symbol in symbols:
+            stock_data, _ = price_store.slice_frame(data[symbol], date_start, date_end)
+            results = {name: per_symbol[symbol] for name, per_symbol in computed.items()}
+            series.append((symbol, series_columns(stock_data, fields, results, max_points)))
+        return series_response(series, mimetype, lambda: {
+            "symbols": symbols,
+            "series": {symbol: json_series(symbol, columns) for symbol, columns in series},
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Error building series: {str(e)}"}), 500
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     if not data:
@@ -405,9 +1183,12 @@ if __name__ == '__main__':
     else:
         print("🚀 SERVER READY!")
         print(f"📊 Loaded {len(data)} symbols: {list(data.keys())}")
-        total_rows = sum(len(df) for df in data.values())
+        summaries = [symbol_summary(symbol) for symbol in data]
+        total_rows = sum(info["rows"] or 0 for info in summaries)
         print(f"📈 Total data points: {total_rows:,}")
-        print(f"📅 Date range: {min(df.index.min() for df in data.values()).strftime('%Y-%m-%d')} to {max(df.index.max() for df in data.values()).strftime('%Y-%m-%d')}")
+        date_ranges = [info["date_range"].split(" to ") for info in summaries if info["date_range"]]
+        if date_ranges:
+            print(f"📅 Date range: {min(r[0] for r in date_ranges)} to {max(r[1] for r in date_ranges)}")
         
         print("\n🎯 Available endpoints:")
         print("  GET /health - Server status")
@@ -415,6 +1196,11 @@ if __name__ == '__main__':
         print("  GET /stock/graph - Main charting endpoint")
         print("  GET /api/stocks/<ticker>/chart - Candlestick charts")
         print("  GET /api/stocks/<ticker>/volume - Volume charts")
+        print("    (charts take ?width=&height=&dpi= and ?format=png|webp|jpeg|svg)")
+        print("  GET /api/stocks/<ticker>/series - Price/indicator series as columnar JSON")
+        print("  GET /api/stocks/series?symbols=... - Series for several symbols")
+        print("    (Accept: application/octet-stream or ?format=packed|arrow for binary columns)")
+        print("  POST /refresh - Pick up rows appended to the CSVs")
     
     print("="*60)
     
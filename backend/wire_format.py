@@ -0,0 +1,135 @@
+"""Binary encodings for the columnar series endpoints.
+
+Two formats besides JSON, picked by content negotiation:
+
+* Arrow IPC stream (application/vnd.apache.arrow.stream), when pyarrow is
+  installed. One record batch per symbol with a `symbol` column first.
+* Packed little-endian arrays (application/octet-stream), no dependencies:
+
+      8 bytes   magic b"PXCOLS01"
+      4 bytes   uint32 little-endian length of the JSON header
+      header    UTF-8 JSON: {"series": [{"symbol", "rows", "columns":
+                [{"name", "dtype", "offset", "nbytes"}]}]}
+      padding   to a multiple of 8 bytes
+      buffers   each column's raw values at its offset, counted from the
+                end of the padding, each 8-byte aligned
+
+  dtype is a NumPy type string such as "<f8", "<f4", "<i8" or "<u4", so a
+  browser can wrap each column in a typed array without parsing it; dates
+  are int64 epoch milliseconds like in the JSON responses.
+
+Both are built straight from the NumPy arrays of the data layer: values
+are never converted one by one, and the packed format hands each column's
+buffer to the response as a single block.
+"""
+import json
+import struct
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: Arrow responses are only offered when installed
+    pa = None
+
+JSON_MIME = "application/json"
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+PACKED_MIME = "application/octet-stream"
+PACKED_MAGIC = b"PXCOLS01"
+PACKED_ALIGN = 8
+
+# `format` query parameter values
+FORMATS = {"json": JSON_MIME, "arrow": ARROW_MIME, "packed": PACKED_MIME}
+
+
+def available_mimetypes():
+    """Response types this server can produce, JSON first so it wins ties"""
+    if pa is None:
+        return [JSON_MIME, PACKED_MIME]
+    return [JSON_MIME, ARROW_MIME, PACKED_MIME]
+
+
+def little_endian(values):
+    values = np.ascontiguousarray(values)
+    if values.dtype.byteorder == '>' or (values.dtype.byteorder == '=' and not np.little_endian):
+        values = values.astype(values.dtype.newbyteorder('<'))
+    return values
+
+
+def _padding(size):
+    return -size % PACKED_ALIGN
+
+
+def packed_chunks(series):
+    """Encode [(symbol, columns)] in the packed format.
+
+    Returns (content_length, chunks): the header followed by one chunk per
+    column buffer (plus alignment padding), ready to be streamed as is.
+    """
+    layout = []
+    buffers = []
+    offset = 0
+    for symbol, columns in series:
+        entries = []
+        rows = 0
+        for name, values in columns.items():
+            values = little_endian(values)
+            rows = len(values)
+            entries.append({
+                "name": name,
+                "dtype": values.dtype.str,
+                "offset": offset,
+                "nbytes": values.nbytes,
+            })
+            buffers.append(values)
+            offset += values.nbytes + _padding(values.nbytes)
+        layout.append({"symbol": symbol, "rows": rows, "columns": entries})
+
+    header = json.dumps({"series": layout}, separators=(',', ':')).encode('utf-8')
+    prefix = PACKED_MAGIC + struct.pack('<I', len(header)) + header
+    prefix += b"\0" * _padding(len(prefix))
+    # Column offsets in the header are relative to the end of the prefix
+    total = len(prefix) + offset
+
+    def chunks():
+        yield prefix
+        for values in buffers:
+            yield values.tobytes()
+            if _padding(values.nbytes):
+                yield b"\0" * _padding(values.nbytes)
+
+    return total, chunks()
+
+
+def arrow_stream(series):
+    """Encode [(symbol, columns)] as an Arrow IPC stream (requires pyarrow)"""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+
+    # A stream has one schema: give each column one type across symbols and
+    # share one dictionary of symbol names between the batches
+    dtypes = {}
+    for _, columns in series:
+        for name, values in columns.items():
+            dtypes[name] = np.result_type(dtypes.get(name, values.dtype), values.dtype)
+    dictionary = pa.array([symbol for symbol, _ in series])
+
+    sink = pa.BufferOutputStream()
+    writer = None
+    for position, (symbol, columns) in enumerate(series):
+        arrays = {}
+        for name, values in columns.items():
+            values = little_endian(values.astype(dtypes[name], copy=False))
+            if name == "dates":
+                arrays[name] = pa.array(values.view('datetime64[ms]'), type=pa.timestamp('ms', tz='UTC'))
+            else:
+                arrays[name] = pa.array(values)
+        rows = len(columns["dates"])
+        symbols = pa.DictionaryArray.from_arrays(pa.array(np.full(rows, position, dtype=np.int32)), dictionary)
+        batch = pa.RecordBatch.from_arrays([symbols] + list(arrays.values()), names=["symbol"] + list(arrays))
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+    if writer is not None:
+        writer.close()
+    return sink.getvalue()